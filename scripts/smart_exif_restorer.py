@@ -17,25 +17,31 @@ Usage:
     python smart_exif_restorer.py --cli --folder     # Folder date mode
 """
 
+import io
 import os
 import re
 import sys
+import mmap
 import shutil
+import struct
+import queue
+import pickle
+import sqlite3
+import threading
 import argparse
 import hashlib
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, simpledialog
 from pathlib import Path
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from typing import List, Dict, Optional, Tuple, Set
 
 # Image processing imports
-from PIL import Image, ImageTk
+# numpy, cv2, imagehash and tkinter are imported where they are used so that
+# CLI runs (e.g. --skip-duplicates) don't pay for modules they never touch
+from PIL import Image
 import piexif
-import numpy as np
-import imagehash
-import cv2
 
 
 # =============================================================================
@@ -46,12 +52,97 @@ class ExifUtils:
     """Shared EXIF operations utilities"""
 
     SUPPORTED_FORMATS = ('.jpg', '.jpeg', '.png', '.heic')
+    SUPPORTED_EXTENSIONS = frozenset(SUPPORTED_FORMATS)
+
+    # .backup folders already created by backup_file in this process
+    _backup_dirs = set()
+
+    # Date patterns in priority order: (compiled regex, format specifier)
+    DATE_PATTERNS = [
+        # 2024-12-25, 2024.12.25, 2024_12_25
+        (re.compile(r'(\d{4})[-._](\d{1,2})[-._](\d{1,2})'), 'ymd'),
+        # 20241225
+        (re.compile(r'(\d{4})(\d{2})(\d{2})'), 'ymd_compact'),
+        # 2024年12月25日
+        (re.compile(r'(\d{4})年(\d{1,2})月(\d{1,2})日?'), 'chinese'),
+        # 12-25-2024, 12.25.2024
+        (re.compile(r'(\d{1,2})[-._](\d{1,2})[-._](\d{4})'), 'mdy'),
+    ]
+
+    @staticmethod
+    def is_supported(filename):
+        """Check the file extension against SUPPORTED_FORMATS (case-insensitive)"""
+        # Only the extension is lowercased, not the whole name
+        return os.path.splitext(filename)[1].lower() in ExifUtils.SUPPORTED_EXTENSIONS
 
     @staticmethod
-    def get_exif_datetime(image_path):
-        """Extract EXIF datetime from image"""
+    def iter_photo_dirs(folder, accept=None, skip_backup=False):
+        """
+        Yield (directory, photo DirEntries) for every directory holding photos, in os.walk order
+
+        Reads each directory once with os.scandir and uses the DirEntry type
+        info instead of a stat per entry. Like os.walk, symlinked directories
+        are listed but not descended into. accept(filename) picks the photos
+        (default: is_supported); skip_backup leaves out paths containing '.backup'.
+        """
+        accept = accept or ExifUtils.is_supported
+        pending = [folder]
+        while pending:
+            current = pending.pop()
+            if skip_backup and '.backup' in current:
+                continue
+
+            try:
+                with os.scandir(current) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+
+            photos = []
+            subdirs = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+
+                if is_dir:
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                elif accept(entry.name):
+                    photos.append(entry)
+
+            if photos:
+                yield current, photos
+            # Reversed so the first subdirectory is walked next
+            pending.extend(reversed(subdirs))
+
+    @staticmethod
+    def get_exif_datetime(image_path, data=None):
+        """
+        Extract EXIF datetime from image
+
+        Args:
+            data: Optional already-mapped file contents; only its Exif segment is parsed
+        """
         try:
-            exif_dict = piexif.load(image_path)
+            exif_source = image_path
+            if data is not None:
+                _, tiff = ExifUtils._read_exif_tiff(data)
+            elif image_path.lower().endswith(('.jpg', '.jpeg')):
+                with open(image_path, 'rb') as f:
+                    _, tiff = ExifUtils._read_exif_tiff(f)
+            else:
+                tiff = None
+
+            if tiff is not None:
+                # Fast path: read just the date tags; anything unusual falls
+                # through to the full piexif parse below
+                date = ExifUtils._read_datetime_fast(tiff)
+                if date is not None:
+                    return date
+                exif_source = tiff
+            exif_dict = piexif.load(exif_source)
 
             # Try DateTimeOriginal first
             if piexif.ExifIFD.DateTimeOriginal in exif_dict.get('Exif', {}):
@@ -75,31 +166,176 @@ class ExifUtils:
     def write_exif_datetime(image_path, target_datetime, source_exif=None):
         """Write EXIF datetime to image"""
         try:
+            # Common case: patch the existing date fields without re-dumping EXIF
+            if source_exif is None and ExifUtils._patch_datetime_fast(image_path, target_datetime):
+                return True
+
             date_str = target_datetime.strftime("%Y:%m:%d %H:%M:%S")
 
-            # Load existing EXIF or create new
-            try:
-                exif_dict = piexif.load(image_path)
-            except:
-                exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}}
-
-            # Write all three date fields for Google Photos compatibility
-            exif_dict['0th'][piexif.ImageIFD.DateTime] = date_str
-            exif_dict['Exif'][piexif.ExifIFD.DateTimeOriginal] = date_str
-            exif_dict['Exif'][piexif.ExifIFD.DateTimeDigitized] = date_str
-
-            # Remove thumbnail to reduce file size
-            if "thumbnail" in exif_dict:
-                del exif_dict["thumbnail"]
-
-            # Write to file
-            exif_bytes = piexif.dump(exif_dict)
-            piexif.insert(exif_bytes, image_path)
+            def set_dates(exif_dict):
+                # Write all three date fields for Google Photos compatibility
+                exif_dict['0th'][piexif.ImageIFD.DateTime] = date_str
+                exif_dict['Exif'][piexif.ExifIFD.DateTimeOriginal] = date_str
+                exif_dict['Exif'][piexif.ExifIFD.DateTimeDigitized] = date_str
+
+            ExifUtils._rewrite_exif(image_path, set_dates)
             return True
         except Exception as e:
             print(f"    ❌ EXIF write failed: {e}")
             return False
 
+    @staticmethod
+    def write_exif_datetime_batch(pairs, backup=False):
+        """
+        Write EXIF datetimes for many (image_path, datetime) pairs
+
+        Files are independent, so writes (and, with backup=True, the backup
+        copy made just before each one) overlap their file I/O on a thread pool.
+
+        Returns:
+            List of success flags, in input order
+        """
+        def write(pair):
+            if backup:
+                ExifUtils.backup_file(pair[0])
+            return ExifUtils.write_exif_datetime(*pair)
+
+        if len(pairs) < 2:
+            return [write(pair) for pair in pairs]
+
+        with ThreadPoolExecutor(max_workers=min(8, len(pairs))) as executor:
+            return list(executor.map(write, pairs))
+
+    @staticmethod
+    def _patch_datetime_fast(image_path, target_datetime):
+        """
+        Overwrite DateTime/DateTimeOriginal/DateTimeDigitized in place
+
+        Only handles JPEGs whose APP1 segment already holds all three tags as
+        20-byte ASCII values. Returns False so callers can fall back to a full
+        piexif rewrite otherwise.
+        """
+        value = target_datetime.strftime("%Y:%m:%d %H:%M:%S").encode('ascii') + b'\x00'
+
+        with open(image_path, 'r+b') as f:
+            tiff_start, tiff = ExifUtils._read_exif_tiff(f)
+            if tiff is None:
+                return False
+
+            offsets = ExifUtils._find_datetime_offsets(tiff)
+            if offsets is None:
+                return False
+
+            for offset in offsets:
+                f.seek(tiff_start + offset)
+                f.write(value)
+        return True
+
+    @staticmethod
+    def _read_exif_tiff(f):
+        """
+        Locate the Exif APP1 segment of a JPEG file
+
+        Returns:
+            (file offset of the TIFF header, TIFF bytes), or (None, None)
+        """
+        f.seek(0)
+        if f.read(2) != b'\xff\xd8':
+            return None, None
+
+        while True:
+            header = f.read(4)
+            if len(header) < 4 or header[0] != 0xFF or header[1] in (0xD9, 0xDA):
+                return None, None
+
+            length = struct.unpack('>H', header[2:4])[0]
+            if header[1] == 0xE1:
+                data = f.read(length - 2)
+                if data[:6] == b'Exif\x00\x00':
+                    return f.tell() - len(data) + 6, data[6:]
+            else:
+                f.seek(length - 2, os.SEEK_CUR)
+
+    @staticmethod
+    def _read_date_ifds(tiff):
+        """
+        Raw entries of IFD0 and the Exif IFD of a TIFF block
+
+        Returns:
+            (ifd0, exif_ifd) as {tag: (type, count, value/offset)} dicts, or None.
+            exif_ifd is empty when there is no Exif pointer.
+        """
+        if tiff[:2] == b'II':
+            endian = '<'
+        elif tiff[:2] == b'MM':
+            endian = '>'
+        else:
+            return None
+
+        def read_ifd(offset):
+            count = struct.unpack(endian + 'H', tiff[offset:offset + 2])[0]
+            entries = {}
+            for i in range(count):
+                pos = offset + 2 + i * 12
+                tag, type_, n, value = struct.unpack(endian + 'HHII', tiff[pos:pos + 12])
+                entries[tag] = (type_, n, value)
+            return entries
+
+        ifd0 = read_ifd(struct.unpack(endian + 'I', tiff[4:8])[0])
+        exif_ifd = {}
+        if piexif.ImageIFD.ExifTag in ifd0:
+            exif_ifd = read_ifd(ifd0[piexif.ImageIFD.ExifTag][2])
+        return ifd0, exif_ifd
+
+    @staticmethod
+    def _read_datetime_fast(tiff):
+        """
+        DateTimeOriginal (else DateTime) straight from the TIFF IFDs, or None
+
+        Walks only IFD0 and the Exif IFD instead of decoding every tag like
+        piexif.load. None means "not found here", not "no date".
+        """
+        try:
+            ifds = ExifUtils._read_date_ifds(tiff)
+            if ifds is None:
+                return None
+            ifd0, exif_ifd = ifds
+
+            for field in (exif_ifd.get(piexif.ExifIFD.DateTimeOriginal),
+                          ifd0.get(piexif.ImageIFD.DateTime)):
+                # A date is ASCII (type 2) and too long to be stored inline
+                if field is None or field[0] != 2 or field[1] <= 4:
+                    continue
+                raw = tiff[field[2]:field[2] + field[1]]
+                return datetime.strptime(raw.rstrip(b'\x00').decode('utf-8'), "%Y:%m:%d %H:%M:%S")
+        except (struct.error, IndexError, ValueError, UnicodeDecodeError):
+            pass
+        return None
+
+    @staticmethod
+    def _find_datetime_offsets(tiff):
+        """Return TIFF offsets of the three 20-byte ASCII date values, or None"""
+        try:
+            ifds = ExifUtils._read_date_ifds(tiff)
+            if ifds is None or not ifds[1]:
+                return None
+            ifd0, exif_ifd = ifds
+
+            fields = [
+                ifd0.get(piexif.ImageIFD.DateTime),
+                exif_ifd.get(piexif.ExifIFD.DateTimeOriginal),
+                exif_ifd.get(piexif.ExifIFD.DateTimeDigitized),
+            ]
+            offsets = []
+            for field in fields:
+                # Must exist as ASCII (type 2) with exactly 19 chars + NUL
+                if field is None or field[0] != 2 or field[1] != 20 or field[2] + 20 > len(tiff):
+                    return None
+                offsets.append(field[2])
+            return offsets
+        except (struct.error, IndexError):
+            return None
+
     @staticmethod
     def get_gps_coords(image_path):
         """Extract GPS coordinates from image EXIF"""
@@ -132,11 +368,6 @@ class ExifUtils:
     def write_gps_coords(image_path, gps_coords):
         """Write GPS coordinates to image EXIF"""
         try:
-            try:
-                exif_dict = piexif.load(image_path)
-            except:
-                exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}}
-
             def to_dms(decimal, ref):
                 """Convert decimal degrees to DMS format"""
                 decimal = abs(decimal)
@@ -152,34 +383,132 @@ class ExifUtils:
             lat = gps_coords['lat']
             lon = gps_coords['lon']
 
-            exif_dict['GPS'][piexif.GPSIFD.GPSLatitude] = to_dms(lat, 'N')
-            exif_dict['GPS'][piexif.GPSIFD.GPSLatitudeRef] = 'S' if lat < 0 else 'N'
-            exif_dict['GPS'][piexif.GPSIFD.GPSLongitude] = to_dms(lon, 'E')
-            exif_dict['GPS'][piexif.GPSIFD.GPSLongitudeRef] = 'W' if lon < 0 else 'E'
-
-            # Remove thumbnail to reduce file size
-            if "thumbnail" in exif_dict:
-                del exif_dict["thumbnail"]
+            def set_gps(exif_dict):
+                exif_dict['GPS'][piexif.GPSIFD.GPSLatitude] = to_dms(lat, 'N')
+                exif_dict['GPS'][piexif.GPSIFD.GPSLatitudeRef] = 'S' if lat < 0 else 'N'
+                exif_dict['GPS'][piexif.GPSIFD.GPSLongitude] = to_dms(lon, 'E')
+                exif_dict['GPS'][piexif.GPSIFD.GPSLongitudeRef] = 'W' if lon < 0 else 'E'
 
-            exif_bytes = piexif.dump(exif_dict)
-            piexif.insert(exif_bytes, image_path)
+            ExifUtils._rewrite_exif(image_path, set_gps)
             return True
         except Exception as e:
             print(f"    ❌ GPS write failed: {e}")
             return False
 
+    @staticmethod
+    def _rewrite_exif(image_path, update):
+        """
+        Apply update(exif_dict) to a JPEG's EXIF without loading the whole file
+
+        Only the header segments are held in memory: the new APP1 goes right
+        after SOI (replacing the old Exif APP1 and, as piexif.insert does, a
+        leading JFIF APP0), the compressed image data is streamed across in
+        1 MiB chunks, and the fsynced result replaces the file atomically.
+        """
+        tmp_path = image_path + '.exif-tmp'
+        try:
+            with open(image_path, 'rb') as src:
+                # Load existing EXIF or create new
+                _, tiff = ExifUtils._read_exif_tiff(src)
+                try:
+                    exif_dict = piexif.load(tiff) if tiff is not None else None
+                except Exception:
+                    exif_dict = None
+                if exif_dict is None:
+                    exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}}
+
+                update(exif_dict)
+
+                # Remove thumbnail to reduce file size
+                if "thumbnail" in exif_dict:
+                    del exif_dict["thumbnail"]
+
+                exif_bytes = piexif.dump(exif_dict)
+                app1 = b'\xff\xe1' + struct.pack('>H', len(exif_bytes) + 2) + exif_bytes
+
+                # Header segments up to the start of scan
+                src.seek(0)
+                if src.read(2) != b'\xff\xd8':
+                    raise ValueError("Not a JPEG file")
+                segments = []
+                while True:
+                    header = src.read(4)
+                    if len(header) < 4 or header[0] != 0xFF:
+                        raise ValueError("Malformed JPEG header")
+                    if header[1] in (0xDA, 0xD9):
+                        src.seek(-4, os.SEEK_CUR)
+                        break
+                    length = struct.unpack('>H', header[2:4])[0]
+                    segment = header + src.read(length - 2)
+                    if not (header[1] == 0xE1 and segment[4:10] == b'Exif\x00\x00'):
+                        segments.append(segment)
+                if segments and segments[0][1] == 0xE0:
+                    segments.pop(0)
+
+                with open(tmp_path, 'wb') as dst:
+                    dst.write(b'\xff\xd8' + app1 + b''.join(segments))
+                    shutil.copyfileobj(src, dst, 1 << 20)
+                    # Durable before it replaces the original
+                    dst.flush()
+                    os.fsync(dst.fileno())
+
+            # Both files are closed first: Windows can't replace an open file
+            shutil.copymode(image_path, tmp_path)
+            os.replace(tmp_path, image_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _open_sequential(path):
+        """
+        Open a file for a single forward-only read
+
+        Hints the OS to read ahead aggressively and not keep the pages cached
+        (posix_fadvise on Linux, FILE_FLAG_SEQUENTIAL_SCAN via O_SEQUENTIAL on Windows)
+        """
+        flags = os.O_RDONLY | getattr(os, 'O_BINARY', 0) | getattr(os, 'O_SEQUENTIAL', 0)
+        fd = os.open(path, flags)
+        try:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_NOREUSE)
+            return os.fdopen(fd, 'rb')
+        except Exception:
+            os.close(fd)
+            raise
+
+    @staticmethod
+    def _map_file(path):
+        """Memory-map a file read-only (usable as a file object and as a buffer)"""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mapped, 'madvise'):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        return mapped
+
     @staticmethod
     def backup_file(file_path):
         """Backup original file to .backup folder"""
         try:
-            backup_dir = os.path.join(os.path.dirname(file_path), '.backup')
-            os.makedirs(backup_dir, exist_ok=True)
+            folder, filename = os.path.split(file_path)
+            backup_dir = os.path.join(folder, '.backup')
+            # Photos share a few folders, so create each .backup only once
+            if backup_dir not in ExifUtils._backup_dirs:
+                os.makedirs(backup_dir, exist_ok=True)
+                ExifUtils._backup_dirs.add(backup_dir)
 
-            backup_path = os.path.join(backup_dir, os.path.basename(file_path))
+            backup_path = os.path.join(backup_dir, filename)
 
             # Skip if backup exists
             if not os.path.exists(backup_path):
-                shutil.copy2(file_path, backup_path)
+                try:
+                    shutil.copy2(file_path, backup_path)
+                except FileNotFoundError:
+                    # .backup was removed since it was created; make it again
+                    os.makedirs(backup_dir, exist_ok=True)
+                    shutil.copy2(file_path, backup_path)
 
             return True
         except Exception as e:
@@ -192,45 +521,171 @@ class ExifUtils:
         Extract date from folder or filename path
         Supports multiple date formats
         """
-        name = Path(path).name
-
-        # Date patterns: (regex, format specifier, parsing logic)
-        date_patterns = [
-            # 2024-12-25, 2024.12.25, 2024_12_25
-            (r'(\d{4})[-._](\d{1,2})[-._](\d{1,2})', 'ymd'),
-            # 20241225
-            (r'(\d{4})(\d{2})(\d{2})', 'ymd_compact'),
-            # 2024年12月25日
-            (r'(\d{4})年(\d{1,2})月(\d{1,2})日?', 'chinese'),
-            # 12-25-2024, 12.25.2024
-            (r'(\d{1,2})[-._](\d{1,2})[-._](\d{4})', 'mdy'),
-        ]
+        for year, month, day in ExifUtils._date_candidates(Path(path).name):
+            try:
+                return datetime(year, month, day, 12, 0, 0)
+            except ValueError:
+                # Day doesn't exist in that month; try the next pattern
+                continue
 
-        for pattern, mode in date_patterns:
-            match = re.search(pattern, name)
+        return None
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _date_candidates(name):
+        """Return range-checked (year, month, day) candidates in pattern priority order"""
+        candidates = []
+        for pattern, mode in ExifUtils.DATE_PATTERNS:
+            match = pattern.search(name)
             if match:
-                try:
-                    groups = match.groups()
-
-                    # Parse based on format
-                    if mode == 'ymd':
-                        year, month, day = int(groups[0]), int(groups[1]), int(groups[2])
-                    elif mode == 'ymd_compact':
-                        year, month, day = int(groups[0]), int(groups[1]), int(groups[2])
-                    elif mode == 'chinese':
-                        year, month, day = int(groups[0]), int(groups[1]), int(groups[2])
-                    elif mode == 'mdy':
-                        month, day, year = int(groups[0]), int(groups[1]), int(groups[2])
-                    else:
-                        continue
+                groups = match.groups()
 
-                    # Validate date
-                    if 1900 <= year <= 2100 and 1 <= month <= 12 and 1 <= day <= 31:
-                        return datetime(year, month, day, 12, 0, 0)
-                except (ValueError, IndexError):
-                    continue
+                # Parse based on format
+                if mode == 'mdy':
+                    month, day, year = int(groups[0]), int(groups[1]), int(groups[2])
+                else:
+                    year, month, day = int(groups[0]), int(groups[1]), int(groups[2])
 
-        return None
+                # Validate date
+                if 1900 <= year <= 2100 and 1 <= month <= 12 and 1 <= day <= 31:
+                    candidates.append((year, month, day))
+
+        return tuple(candidates)
+
+
+class HashUtils:
+    """Shared perceptual hash utilities"""
+
+    @staticmethod
+    def pack_hash(image_hash):
+        """Pack an ImageHash bit matrix into uint64 words (4 words for 16x16)"""
+        import numpy as np
+        packed = np.packbits(image_hash.hash.ravel())
+        return np.frombuffer(packed.tobytes(), dtype=np.uint64)
+
+    @staticmethod
+    def phash(image, hash_size=16):
+        """
+        Perceptual hash, bit-compatible with imagehash.phash
+
+        Only the low-frequency block of the DCT is computed, as two small
+        float32 matmuls against a cached basis, instead of imagehash's two
+        full float64 scipy passes.
+        """
+        import imagehash
+        import numpy as np
+        img_size = hash_size * 4
+        pixels = np.asarray(
+            image.convert('L').resize((img_size, img_size), Image.LANCZOS), dtype=np.float32
+        )
+
+        # Only the low-frequency hash_size x hash_size block is needed: C @ X @ C.T
+        basis = HashUtils._dct_basis(hash_size, img_size)
+        dct = basis @ pixels @ basis.T
+
+        return imagehash.ImageHash(dct > np.median(dct))
+
+    @staticmethod
+    def dhash(gray, hash_size=16):
+        """
+        Difference hash of a uint8 grayscale array, packed into uint64 words
+
+        One INTER_AREA resize to (hash_size + 1) x hash_size, one vectorized
+        neighbour comparison and np.packbits.
+        """
+        import cv2
+        import numpy as np
+        small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+        bits = small[:, 1:] > small[:, :-1]
+        return np.frombuffer(np.packbits(bits.ravel()).tobytes(), dtype=np.uint64)
+
+    @staticmethod
+    def ahash(gray, hash_size=16):
+        """
+        Average hash of a uint8 grayscale array, packed into uint64 words
+
+        One INTER_AREA resize to hash_size x hash_size, compared to its mean.
+        """
+        import cv2
+        import numpy as np
+        small = cv2.resize(gray, (hash_size, hash_size), interpolation=cv2.INTER_AREA)
+        bits = small > small.mean()
+        return np.frombuffer(np.packbits(bits.ravel()).tobytes(), dtype=np.uint64)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _dct_basis(rows, size):
+        """First `rows` DCT-II basis vectors for `size` samples, scaled like scipy's unnormalized DCT"""
+        import numpy as np
+        k = np.arange(rows)[:, None]
+        n = np.arange(size)[None, :]
+        return (2 * np.cos(np.pi * k * (2 * n + 1) / (2 * size))).astype(np.float32)
+
+    @staticmethod
+    def hamming_distance(a, b):
+        """Hamming distance between packed hashes along the last axis"""
+        import numpy as np
+        xor = np.bitwise_xor(a, b)
+        if hasattr(np, 'bitwise_count'):
+            return np.bitwise_count(xor).sum(axis=-1)
+        # NumPy < 2.0 has no popcount ufunc: count 16 bits at a time via a table
+        return HashUtils._popcount16()[xor.view(np.uint16)].sum(axis=-1, dtype=np.int64)
+
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _popcount16():
+        """Set-bit count of every 16-bit value (65536 uint8 entries)"""
+        import numpy as np
+        values = np.arange(1 << 16, dtype=np.uint32)
+        counts = np.zeros(1 << 16, dtype=np.uint8)
+        for bit in range(16):
+            counts += ((values >> bit) & 1).astype(np.uint8)
+        return counts
+
+
+class HammingLSHIndex:
+    """
+    Near-duplicate lookup for packed hashes by exact-match 16-bit bands
+
+    Each hash is split into 16-bit bands. Two hashes within distance d of each
+    other differ in at most d bands, so when d is below the band count they
+    share at least one band exactly (pigeonhole). Only hashes sharing a bucket
+    are compared bit by bit, and no pair within range is missed.
+    """
+
+    def __init__(self, hashes):
+        import numpy as np
+        self.hashes = np.ascontiguousarray(hashes, dtype=np.uint64)
+        # (n, words) uint64 -> (n, words * 4) uint16 band values
+        self.bands = self.hashes.view(np.uint16)
+
+    def candidate_pairs(self):
+        """Return unique (i, j) pairs, i < j, that share at least one band"""
+        import numpy as np
+        pairs = [np.empty((0, 2), dtype=np.int64)]
+
+        for band in self.bands.T:
+            # Stable sort keeps each bucket contiguous and in ascending index order
+            order = np.argsort(band, kind='stable')
+            keys = band[order]
+
+            # Pair every member with the one k slots later while still in the same bucket
+            for k in range(1, len(keys)):
+                same = keys[k:] == keys[:-k]
+                if not same.any():
+                    break
+                pairs.append(np.column_stack((order[:-k][same], order[k:][same])))
+
+        return np.unique(np.concatenate(pairs), axis=0)
+
+    def similar_pairs(self, max_distance: int):
+        """Return an (M, 2) int32 array of index pairs i < j within max_distance"""
+        if max_distance >= self.bands.shape[1]:
+            raise ValueError(f"max_distance must be below the band count ({self.bands.shape[1]})")
+
+        candidates = self.candidate_pairs()
+        distances = HashUtils.hamming_distance(self.hashes[candidates[:, 0]], self.hashes[candidates[:, 1]])
+        return candidates[distances <= max_distance].astype('int32')
 
 
 # =============================================================================
@@ -465,6 +920,9 @@ class DataCleaningDetector:
 class DuplicateDetector:
     """Detect duplicate photos using hash and visual similarity"""
 
+    # Above this many photos, pHash pairs come from the LSH index instead of a full N² scan
+    LSH_MIN_PHOTOS = 2000
+
     def __init__(self, root_folder: str, similarity_threshold: float = 0.92):
         self.root_folder = root_folder
         self.similarity_threshold = similarity_threshold
@@ -487,45 +945,56 @@ class DuplicateDetector:
         print("⏳ Extracting features...")
 
         self.photo_list = []
+        file_paths = []
 
-        for root, dirs, files in os.walk(self.root_folder):
-            if '.backup' in root:
-                continue
-
-            for file in files:
-                if not file.lower().endswith(ExifUtils.SUPPORTED_FORMATS):
-                    continue
-
-                file_path = os.path.join(root, file)
-
+        for _, entries in ExifUtils.iter_photo_dirs(self.root_folder, skip_backup=True):
+            for entry in entries:
                 # Skip if matches pattern
                 if skip_patterns:
-                    if any(p in file.lower() for p in skip_patterns):
+                    name = entry.name.lower()
+                    if any(p in name for p in skip_patterns):
                         continue
 
-                photo_info = self._analyze_photo(file_path)
-                if photo_info:
-                    self.photo_list.append(photo_info)
+                file_paths.append(entry.path)
+
+        # Cheap byte-level pass first; only one file per exact group is decoded
+        exact_groups = self._exact_prefilter(file_paths)
+
+        for file_hash, group_paths in exact_groups.items():
+            photo_info = self._analyze_photo(group_paths[0], file_hash)
+            if not photo_info:
+                continue
+
+            self.photo_list.append(photo_info)
+            # Byte-identical copies share every content-derived field
+            for path in group_paths[1:]:
+                self.photo_list.append({**photo_info, 'path': path, 'filename': os.path.basename(path)})
 
         self.stats['total_photos'] = len(self.photo_list)
         print(f"✅ Analyzed {len(self.photo_list)} photos")
 
-    def _analyze_photo(self, file_path: str) -> Optional[Dict]:
+    def _analyze_photo(self, file_path: str, file_hash: str) -> Optional[Dict]:
         """Analyze single photo for duplicate detection"""
+        import numpy as np
         try:
-            img = Image.open(file_path)
+            # One mapping serves both the JPEG decode and the EXIF parse
+            with ExifUtils._map_file(file_path) as mapped:
+                img = Image.open(mapped)
+
+                # Get file info (before draft() shrinks the reported size)
+                file_size = len(mapped)
+                width, height = img.size
 
-            # Get file info
-            file_size = os.path.getsize(file_path)
-            width, height = img.size
+                # Hashes only use a 64x64 grayscale, so let libjpeg decode a
+                # DCT-scaled (1/2..1/8) grayscale image instead of full resolution
+                img.draft('L', (128, 128))
 
-            # Calculate hashes
-            md5_hash = self._calculate_md5(file_path)
-            p_hash = imagehash.phash(img, hash_size=16)
-            d_hash = imagehash.dhash(img, hash_size=16)
+                # Calculate perceptual hashes
+                p_hash = HashUtils.phash(img, hash_size=16)
+                d_hash = HashUtils.dhash(np.asarray(img.convert('L')), hash_size=16)
 
-            # Get EXIF
-            exif_date = ExifUtils.get_exif_datetime(file_path)
+                # Get EXIF
+                exif_date = ExifUtils.get_exif_datetime(file_path, mapped)
 
             # Check if screenshot by size
             is_screenshot = self._is_likely_screenshot(file_path, width, height)
@@ -537,7 +1006,7 @@ class DuplicateDetector:
                 'width': width,
                 'height': height,
                 'megapixels': width * height / 1_000_000,
-                'md5': md5_hash,
+                'file_hash': file_hash,
                 'p_hash': p_hash,
                 'd_hash': d_hash,
                 'exif_date': exif_date,
@@ -547,13 +1016,29 @@ class DuplicateDetector:
             print(f"    ⚠️  Failed to analyze {file_path}: {e}")
             return None
 
-    def _calculate_md5(self, file_path: str) -> str:
-        """Calculate MD5 hash of file"""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+    def _exact_prefilter(self, paths: List[str]) -> Dict[str, List[str]]:
+        """Group paths by file content hash (byte-identical files), in scan order"""
+        exact_groups = defaultdict(list)
+
+        # hashlib releases the GIL on large buffers, so threads overlap I/O and hashing
+        with ThreadPoolExecutor() as executor:
+            for path, file_hash in zip(paths, executor.map(self._hash_file, paths)):
+                if file_hash is not None:
+                    exact_groups[file_hash].append(path)
+
+        return exact_groups
+
+    def _hash_file(self, file_path: str) -> Optional[str]:
+        """Calculate BLAKE2b hash of file contents"""
+        try:
+            file_hash = hashlib.blake2b(digest_size=16)
+            with ExifUtils._open_sequential(file_path) as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    file_hash.update(chunk)
+            return file_hash.hexdigest()
+        except OSError as e:
+            print(f"    ⚠️  Failed to read {file_path}: {e}")
+            return None
 
     def _is_likely_screenshot(self, file_path: str, width: int, height: int) -> bool:
         """Detect if image is likely a screenshot by dimensions"""
@@ -577,62 +1062,52 @@ class DuplicateDetector:
 
     def find_duplicates(self) -> None:
         """Find duplicate groups using hash and visual similarity"""
+        import numpy as np
         print("\n🔍 Finding duplicates...")
 
-        # Group by MD5 (exact duplicates)
-        md5_groups = defaultdict(list)
-        for photo in self.photo_list:
-            md5_groups[photo['md5']].append(photo)
-
-        # Group by perceptual hash (visual duplicates)
-        p_hash_groups = defaultdict(list)
+        # Group by file hash (exact duplicates)
+        exact_groups = defaultdict(list)
         for photo in self.photo_list:
-            # Convert p_hash to string for grouping
-            p_hash_str = str(photo['p_hash'])
-            p_hash_groups[p_hash_str].append(photo)
+            exact_groups[photo['file_hash']].append(photo)
 
-        # Find similar groups using hash distance
         self.duplicate_groups = []
 
         processed = set()
 
-        # First, add exact MD5 duplicates
-        for md5, photos in md5_groups.items():
+        # First, add exact duplicates
+        for file_hash, photos in exact_groups.items():
             if len(photos) > 1:
                 self.duplicate_groups.append({
                     'type': 'exact',
                     'photos': photos,
-                    'hash': md5[:8]
+                    'hash': file_hash[:8]
                 })
                 for p in photos:
                     processed.add(id(p))
 
-        # Then find visual duplicates
-        for i, photo1 in enumerate(self.photo_list):
-            if id(photo1) in processed:
-                continue
-
-            similar_photos = [photo1]
-
-            for j, photo2 in enumerate(self.photo_list):
-                if i == j or id(photo2) in processed:
-                    continue
-
-                # Calculate hash distance
-                hash_distance = photo1['p_hash'] - photo2['p_hash']
-
-                # If distance is small (≤ 5), consider similar
-                if hash_distance <= 5:
-                    similar_photos.append(photo2)
-
-            if len(similar_photos) > 1:
-                self.duplicate_groups.append({
-                    'type': 'similar',
-                    'photos': similar_photos,
-                    'hash': str(photo1['p_hash'])[:8]
-                })
-                for p in similar_photos:
-                    processed.add(id(p))
+        # Then find visual duplicates (pHash distance ≤ 5) among the rest
+        remaining = [p for p in self.photo_list if id(p) not in processed]
+        if len(remaining) > 1:
+            hashes = np.stack([HashUtils.pack_hash(p['p_hash']) for p in remaining])
+            if len(remaining) > self.LSH_MIN_PHOTOS:
+                # Bucket by hash bands so only candidates are compared, not all N² pairs
+                pairs = HammingLSHIndex(hashes).similar_pairs(max_distance=5)
+            else:
+                pairs = self._find_similar_pairs(hashes, max_distance=5)
+
+            # Union-find the surviving edges into connected groups
+            labels = self._connected_components(pairs, len(remaining))
+            order = np.argsort(labels, kind='stable')
+            _, starts, counts = np.unique(labels[order], return_index=True, return_counts=True)
+
+            for start, count in zip(starts.tolist(), counts.tolist()):
+                if count > 1:
+                    similar_photos = [remaining[i] for i in order[start:start + count].tolist()]
+                    self.duplicate_groups.append({
+                        'type': 'similar',
+                        'photos': similar_photos,
+                        'hash': str(similar_photos[0]['p_hash'])[:8]
+                    })
 
         self.stats['groups_found'] = len(self.duplicate_groups)
         self.stats['duplicates_found'] = sum(len(g['photos']) for g in self.duplicate_groups) - len(self.duplicate_groups)
@@ -641,26 +1116,87 @@ class DuplicateDetector:
         print(f"✅ Found {len(self.duplicate_groups)} duplicate groups")
         print(f"   Total duplicates: {self.stats['duplicates_found']} photos")
 
+    @staticmethod
+    def _find_similar_pairs(hashes, max_distance: int):
+        """Return an (M, 2) int32 array of index pairs i < j within max_distance"""
+        import numpy as np
+        n = len(hashes)
+        # Bound the (block, n, words) XOR temporary to roughly 32MB
+        block = max(1, (1 << 22) // max(1, n * hashes.shape[1]))
+        pairs = [np.empty((0, 2), dtype=np.int32)]
+
+        for start in range(0, n, block):
+            stop = min(start + block, n)
+            distances = HashUtils.hamming_distance(hashes[start:stop, None, :], hashes[None, :, :])
+            rows, cols = np.nonzero(distances <= max_distance)
+            rows += start
+            upper = cols > rows
+            pairs.append(np.column_stack((rows[upper], cols[upper])).astype(np.int32))
+
+        return np.concatenate(pairs)
+
+    @staticmethod
+    def _connected_components(edges, n: int):
+        """
+        Label connected components of an undirected graph
+
+        Array-based union-find: every edge hooks the larger root onto the
+        smaller one, then pointer jumping compresses the paths. Repeats until
+        no edge joins two different roots.
+
+        Returns:
+            int32 array mapping each node to the smallest node index in its component
+        """
+        import numpy as np
+        labels = np.arange(n, dtype=np.int32)
+        if len(edges) == 0:
+            return labels
+
+        src, dst = edges[:, 0], edges[:, 1]
+        while True:
+            src_roots, dst_roots = labels[src], labels[dst]
+            smaller = np.minimum(src_roots, dst_roots)
+            hooked = labels.copy()
+            np.minimum.at(hooked, src_roots, smaller)
+            np.minimum.at(hooked, dst_roots, smaller)
+
+            # Path compression
+            while True:
+                jumped = hooked[hooked]
+                if np.array_equal(jumped, hooked):
+                    break
+                hooked = jumped
+
+            if np.array_equal(hooked, labels):
+                return labels
+            labels = hooked
+
     def print_duplicate_groups(self):
         """Print duplicate group details"""
         if not self.duplicate_groups:
             print("\n✅ No duplicates found!")
             return
 
-        print("\n" + "=" * 80)
-        print("📋 Duplicate Groups Found")
-        print("=" * 80)
+        lines = [
+            "",
+            "=" * 80,
+            "📋 Duplicate Groups Found",
+            "=" * 80,
+        ]
 
         for idx, group in enumerate(self.duplicate_groups, 1):
             group_type = "EXACT DUPLICATES" if group['type'] == 'exact' else "SIMILAR PHOTOS"
-            print(f"\nGROUP {idx}: {group_type} ({len(group['photos'])} photos, Hash: {group['hash']})")
+            lines.append(f"\nGROUP {idx}: {group_type} ({len(group['photos'])} photos, Hash: {group['hash']})")
 
             for photo in group['photos']:
                 exif_str = photo['exif_date'].strftime('%Y-%m-%d %H:%M') if photo['exif_date'] else "No EXIF"
                 screenshot_tag = " - SCREENSHOT" if photo['is_screenshot'] else ""
 
-                print(f"  ├── {photo['filename']}")
-                print(f"  │    └── {photo['width']}x{photo['height']}, {photo['size']/1024/1024:.1f}MB, {exif_str}{screenshot_tag}")
+                lines.append(f"  ├── {photo['filename']}")
+                lines.append(f"  │    └── {photo['width']}x{photo['height']}, {photo['size']/1024/1024:.1f}MB, {exif_str}{screenshot_tag}")
+
+        # Single write for the whole listing
+        sys.stdout.write("\n".join(lines) + "\n")
 
     def get_merge_recommendation(self, group: Dict) -> str:
         """Get recommended merge action for a group"""
@@ -671,9 +1207,8 @@ class DuplicateDetector:
             return 'delete'
 
         # If one has much better quality, recommend best quality
-        sizes = [(p['size'], p) for p in photos]
-        sizes.sort(reverse=True)
-        if sizes[0][0] > sizes[1][0] * 1.5:
+        sizes = sorted((p['size'] for p in photos), reverse=True)
+        if sizes[0] > sizes[1] * 1.5:
             return 'best_quality'
 
         # Default to smart merge
@@ -704,34 +1239,55 @@ class DuplicateMergeManager:
             'photos_backed_up': 0
         }
 
-    def present_merge_options(self, group: Dict) -> str:
-        """Present iOS-style merge options for a duplicate group"""
-        photos = group['photos']
+    def review_merge_plan(self, groups: List[Dict], recommendations: List[str]) -> List[str]:
+        """
+        Show all duplicate groups in one table and prompt once for overrides
+
+        Args:
+            groups: Duplicate groups from DuplicateDetector
+            recommendations: Default action per group
+
+        Returns:
+            Action per group, in the same order as groups
+        """
+        actions = list(recommendations)
+        action_keys = {action: key for key, action in self.MERGE_OPTIONS.items()}
+
+        lines = [
+            "",
+            "-" * 80,
+            "❓ Merge plan (recommended action per group)",
+            "-" * 80,
+            f"{'#':>4}  {'Type':<8}  {'Photos':>6}  {'Action':<16}  Master candidate",
+        ]
+        for idx, (group, action) in enumerate(zip(groups, actions), 1):
+            master = max(group['photos'], key=lambda p: p['size'])
+            lines.append(
+                f"{idx:>4}  {group['type']:<8}  {len(group['photos']):>6}  "
+                f"[{action_keys[action]}] {action:<12}  {master['filename']}"
+            )
+        lines.extend([
+            "-" * 80,
+            "[K] Keep All  [B] Best Quality  [T] Timeline  [M] Smart Merge  [D] Delete  [R] Review",
+            "-" * 80,
+        ])
+        sys.stdout.write("\n".join(lines) + "\n")
+
+        response = input("Override actions (e.g. '1=K, 3=B'), Enter to accept all: ").strip()
+        for token in filter(None, (t.strip() for t in response.split(','))):
+            index_str, _, key = token.partition('=')
+            try:
+                idx = int(index_str) - 1
+                action = self.MERGE_OPTIONS[key.strip().upper()]
+            except (ValueError, KeyError):
+                print(f"    ⚠️  Ignoring invalid override: {token}")
+                continue
+            if 0 <= idx < len(actions):
+                actions[idx] = action
+            else:
+                print(f"    ⚠️  No group #{idx + 1}, ignoring: {token}")
 
-        print("\n" + "-" * 80)
-        print("❓ How would you like to handle this group?")
-        print("-" * 80)
-        print("[K] Keep All Versions")
-        print("    → No merge, process each photo independently")
-        print("")
-        print("[B] Keep Best Quality Version")
-        print("    → Keep highest resolution, backup others")
-        print("")
-        print("[T] Keep Timeline Version")
-        print("    → Keep photo with earliest shooting time")
-        print("")
-        print("[M] Smart Merge (Recommended)")
-        print("    → Keep best version + reconcile EXIF metadata")
-        print("")
-        print("[D] Delete Duplicates Safely")
-        print("    → Keep original, backup duplicates")
-        print("")
-        print("[R] Manual Review Mode")
-        print("    → View each photo and decide individually")
-        print("-" * 80)
-
-        response = input("Your choice: ").strip().upper()
-        return self.MERGE_OPTIONS.get(response, 'keep_all')
+        return actions
 
     def execute_merge(self, group: Dict, action: str) -> Dict:
         """Execute merge action on duplicate group"""
@@ -899,27 +1455,12 @@ class FolderDateProcessor:
         # Collect folders with dates
         folders_with_dates = []
 
-        for root, dirs, files in os.walk(self.root_folder):
-            if '.backup' in root:
-                continue
-
-            has_photos = any(
-                f.lower().endswith(ExifUtils.SUPPORTED_FORMATS) for f in files
-            )
-
-            if has_photos:
-                folder_date = ExifUtils.extract_date_from_path(root)
-                if folder_date:
-                    folders_with_dates.append((root, folder_date))
+        for root, entries in ExifUtils.iter_photo_dirs(self.root_folder, skip_backup=True):
+            folder_date, from_folder = self._find_folder_date(root, [entry.name for entry in entries])
+            if folder_date:
+                folders_with_dates.append((root, folder_date))
+                if from_folder:
                     self.stats['total_folders'] += 1
-                else:
-                    # Try extracting from filenames
-                    for file in files:
-                        if file.lower().endswith(ExifUtils.SUPPORTED_FORMATS):
-                            file_date = ExifUtils.extract_date_from_path(file)
-                            if file_date:
-                                folders_with_dates.append((root, file_date))
-                                break
 
         if not folders_with_dates:
             print("\n❌ No folders with detectable dates found!")
@@ -943,70 +1484,118 @@ class FolderDateProcessor:
         # Print summary
         self._print_summary()
 
+    def _find_folder_date(self, folder_path, photo_files):
+        """
+        Find a folder's date from its name, else from the first dated photo filename
+
+        Returns:
+            (datetime or None, whether the date came from the folder name)
+        """
+        folder_date = ExifUtils.extract_date_from_path(folder_path)
+        if folder_date:
+            return folder_date, True
+
+        for file in photo_files:
+            file_date = ExifUtils.extract_date_from_path(file)
+            if file_date:
+                return file_date, False
+
+        return None, False
+
     def _process_folder(self, folder_path, folder_date):
         """Process single folder"""
-        print(f"\n📁 Folder: {Path(folder_path).name}")
-        print(f"   Date: {folder_date.strftime('%Y-%m-%d')}")
-
-        photo_files = [
-            f for f in os.listdir(folder_path)
-            if f.lower().endswith(ExifUtils.SUPPORTED_FORMATS)
+        # normpath so a trailing separator on the root folder still yields its name
+        folder_name = os.path.basename(os.path.normpath(folder_path))
+        header = [
+            f"\n📁 Folder: {folder_name}",
+            f"   Date: {folder_date.year:04d}-{folder_date.month:02d}-{folder_date.day:02d}",
         ]
 
-        if not photo_files:
-            print("   ⚠️  No photos found")
+        # DirEntry carries name and full path from the single directory read
+        with os.scandir(folder_path) as it:
+            photo_entries = sorted(
+                (e for e in it if e.is_file() and ExifUtils.is_supported(e.name)),
+                key=lambda e: e.name
+            )
+
+        if not photo_entries:
+            header.append("   ⚠️  No photos found")
+            sys.stdout.write("\n".join(header) + "\n")
             return
 
-        print(f"   Found {len(photo_files)} photos")
+        header.append(f"   Found {len(photo_entries)} photos")
+        sys.stdout.write("\n".join(header) + "\n")
 
-        processed = 0
-        for idx, file in enumerate(sorted(photo_files)):
-            file_path = os.path.join(folder_path, file)
-            self.stats['processed_photos'] += 1
+        # Per-file status lines are buffered as (file index, line) and written
+        # once per folder, in file order
+        log = []
+
+        # Loop invariants: one clock read per folder, local stats lookup
+        now = datetime.now()
+        stats = self.stats
 
-            existing_date = ExifUtils.get_exif_datetime(file_path)
+        # Writes are queued and flushed once per folder
+        pending = []
+        for idx, entry in enumerate(photo_entries):
+            file, file_path = entry.name, entry.path
+            stats['processed_photos'] += 1
 
             # Determine if processing needed
             need_process = False
             reason = ""
 
-            if existing_date is None:
-                need_process = True
-                reason = "No EXIF"
-                self.stats['no_exif'] += 1
-            elif self.overwrite_existing:
+            if self.overwrite_existing:
+                # Every file is rewritten, so the existing date is never read
                 need_process = True
                 reason = "Force overwrite"
-            elif existing_date.year < 2000 or existing_date > datetime.now():
-                need_process = True
-                reason = "Invalid date"
-                self.stats['wrong_date'] += 1
-            elif abs((existing_date - folder_date).days) > 365:
-                need_process = True
-                reason = "Date deviation > 1 year"
-                self.stats['wrong_date'] += 1
+            else:
+                existing_date = ExifUtils.get_exif_datetime(file_path)
+
+                if existing_date is None:
+                    need_process = True
+                    reason = "No EXIF"
+                    stats['no_exif'] += 1
+                elif existing_date.year < 2000 or existing_date > now:
+                    need_process = True
+                    reason = "Invalid date"
+                    stats['wrong_date'] += 1
+                elif abs((existing_date - folder_date).days) > 365:
+                    need_process = True
+                    reason = "Date deviation > 1 year"
+                    stats['wrong_date'] += 1
 
             if need_process:
                 # Calculate photo time (2 minute intervals)
                 photo_datetime = folder_date + timedelta(minutes=idx * 2)
+                pending.append((idx, file, file_path, photo_datetime, reason))
+            else:
+                log.append((idx, f"   ⏭️  Skip: {file[:30]} (has valid EXIF)"))
+                stats['skipped'] += 1
 
-                # Backup
-                if self.backup:
-                    ExifUtils.backup_file(file_path)
+        # Backup and write EXIF
+        results = ExifUtils.write_exif_datetime_batch(
+            [(file_path, photo_datetime) for _, _, file_path, photo_datetime, _ in pending],
+            backup=self.backup
+        )
 
-                # Write EXIF
-                if ExifUtils.write_exif_datetime(file_path, photo_datetime):
-                    print(f"   ✅ [{reason}] {file[:30]} → {photo_datetime.strftime('%Y-%m-%d %H:%M')}")
-                    self.stats['success'] += 1
-                    processed += 1
-                else:
-                    print(f"   ❌ Failed: {file[:30]}")
-                    self.stats['failed'] += 1
+        processed = 0
+        for (idx, file, _, photo_datetime, reason), ok in zip(pending, results):
+            if ok:
+                log.append((idx,
+                    f"   ✅ [{reason}] {file[:30]} → "
+                    f"{photo_datetime.year:04d}-{photo_datetime.month:02d}-{photo_datetime.day:02d} "
+                    f"{photo_datetime.hour:02d}:{photo_datetime.minute:02d}"
+                ))
+                stats['success'] += 1
+                processed += 1
             else:
-                print(f"   ⏭️  Skip: {file[:30]} (has valid EXIF)")
-                self.stats['skipped'] += 1
+                log.append((idx, f"   ❌ Failed: {file[:30]}"))
+                stats['failed'] += 1
 
-        print(f"   Complete: {processed}/{len(photo_files)} photos processed")
+        log.sort(key=lambda item: item[0])
+        lines = [line for _, line in log]
+        lines.append(f"   Complete: {processed}/{len(photo_entries)} photos processed")
+        sys.stdout.write("\n".join(lines) + "\n")
 
     def _print_summary(self):
         """Print processing summary"""
@@ -1036,84 +1625,475 @@ class FolderDateProcessor:
 class VisualFeatureExtractor:
     """Extract visual features for similarity matching"""
 
+    # Sobel L1 magnitude cutoff; calibrated so densities track Canny(100, 200)
+    EDGE_THRESHOLD = 200
+
     @staticmethod
     def extract_features(image_path):
         """Extract comprehensive visual features"""
+        features, error = _extract_one(image_path)
+        if error:
+            print(f"Feature extraction failed {image_path}: {error}")
+        return features
+
+    @staticmethod
+    def iter_features(image_paths, workers=None, cache=None):
+        """
+        Extract features for many images in a process pool, yielding them in input order
+
+        Failures are reported here in the parent process, so worker output never interleaves.
+        With a FeatureCache, unchanged files are served from it and only the rest are decoded.
+        """
+        cached = cache.get_many(image_paths) if cache is not None else {}
+        misses = [p for p in image_paths if p not in cached]
+
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(misses) < 2:
+            results = map(_extract_one, misses)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            # Batch paths per IPC round trip, but keep enough chunks to balance the workers
+            chunksize = max(1, min(16, len(misses) // (4 * workers)))
+            results = executor.map(_extract_one, misses, chunksize=chunksize)
+
         try:
-            img = Image.open(image_path)
-
-            # 1. Perceptual hashes
-            p_hash = imagehash.phash(img, hash_size=16)
-            d_hash = imagehash.dhash(img, hash_size=16)
-            a_hash = imagehash.average_hash(img, hash_size=16)
-
-            # 2. Color histogram
-            img_array = np.array(img.resize((256, 256)))
-            if len(img_array.shape) == 3:
-                color_hist = [np.histogram(img_array[:,:,i], bins=32)[0] for i in range(3)]
-                color_hist = np.concatenate(color_hist)
-            else:
-                color_hist = np.histogram(img_array, bins=32)[0]
+            for image_path in image_paths:
+                if image_path in cached:
+                    yield cached[image_path]
+                    continue
 
-            # 3. Edge features
-            img_cv = cv2.cvtColor(np.array(img.resize((256, 256))), cv2.COLOR_RGB2GRAY)
-            edges = cv2.Canny(img_cv, 100, 200)
-            edge_density = np.sum(edges > 0) / edges.size
+                features, error = next(results)
+                if error:
+                    print(f"Feature extraction failed {image_path}: {error}")
+                elif cache is not None:
+                    cache.put(image_path, features)
+                yield features
+        finally:
+            if executor is not None:
+                if sys.version_info >= (3, 9):
+                    # Don't finish queued images if the caller stopped early
+                    executor.shutdown(cancel_futures=True)
+                else:
+                    executor.shutdown()
+            if cache is not None:
+                cache.commit()
 
-            return {
-                'p_hash': p_hash,
-                'd_hash': d_hash,
-                'a_hash': a_hash,
-                'color_hist': color_hist,
-                'edge_density': edge_density
-            }
-        except Exception as e:
-            print(f"Feature extraction failed {image_path}: {e}")
-            return None
+    @staticmethod
+    def _extract_features(image_path):
+        """Extract features, raising on failure"""
+        import cv2
+        import numpy as np
+        with ExifUtils._open_sequential(image_path) as f:
+            data = f.read()
+
+        # Let OpenCV's libjpeg decode straight to a reduced size; PIL only for what it can't read
+        bgr = VisualFeatureExtractor._decode_reduced(data)
+        if bgr is not None:
+            gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+            # One 256x256 resize shared by the histogram and edge features; swap
+            # channels only on the small result
+            img_array = cv2.cvtColor(
+                cv2.resize(bgr, (256, 256), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB
+            )
+        else:
+            img = Image.open(io.BytesIO(data))
+            img.load()
+            gray = np.asarray(img.convert('L'))
+            # 3 channels, like the OpenCV path, so every histogram has 96 bins
+            img_array = np.asarray(img.convert('RGB').resize((256, 256)))
+
+        # 1. Perceptual hashes, all from the one grayscale frame
+        p_hash = HashUtils.phash(Image.fromarray(gray), hash_size=16)
+        d_hash = HashUtils.dhash(gray, hash_size=16)
+        a_hash = HashUtils.ahash(gray, hash_size=16)
+
+        # 2. Color histogram (32 fixed-width bins per RGB channel; both decode
+        # paths give 3 channels). calcHist counts ~4x faster than bincount
+        color_hist = np.concatenate([
+            cv2.calcHist([img_array], [channel], None, [32], [0, 256]).ravel()
+            for channel in range(3)
+        ])
+        color_hist = VisualFeatureExtractor._quantize_histogram(color_hist)
+
+        # 3. Edge features (share of pixels with a strong L1 Sobel gradient;
+        # only the density is used, so Canny's NMS/hysteresis is skipped)
+        img_cv = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+        grad_x = cv2.Sobel(img_cv, cv2.CV_16S, 1, 0)
+        grad_y = cv2.Sobel(img_cv, cv2.CV_16S, 0, 1)
+        strong = np.abs(grad_x) + np.abs(grad_y) > VisualFeatureExtractor.EDGE_THRESHOLD
+        edge_density = np.count_nonzero(strong) / strong.size
+
+        # Hashes are kept packed as 4 x uint64 so comparisons are a popcount
+        return {
+            'p_hash': HashUtils.pack_hash(p_hash),
+            'd_hash': d_hash,
+            'a_hash': a_hash,
+            'color_hist': color_hist,
+            'edge_density': edge_density
+        }
 
     @staticmethod
-    def calculate_similarity(target_features, ref_features, weights=None):
-        """Calculate weighted similarity score"""
-        if not target_features or not ref_features:
-            return 0.0
+    def _decode_reduced(data):
+        """
+        Decode image bytes with OpenCV at 1/2, 1/4 or 1/8 scale (DCT-domain for JPEG)
+
+        Picks the strongest reduction that keeps the short side >= 256 px.
+        EXIF orientation is ignored, as with PIL. Returns BGR, or None if
+        OpenCV can't decode the format (e.g. HEIC).
+        """
+        import cv2
+        import numpy as np
+        try:
+            with Image.open(io.BytesIO(data)) as header:
+                short_side = min(header.size)
+        except Exception:
+            short_side = 0
+
+        flag = cv2.IMREAD_COLOR
+        for scale, reduced in ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                               (4, cv2.IMREAD_REDUCED_COLOR_4),
+                               (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if short_side // scale >= 256:
+                flag = reduced
+                break
+
+        # imdecode on a buffer also sidesteps cv2.imread's non-ASCII path issues on Windows
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag | cv2.IMREAD_IGNORE_ORIENTATION)
 
+    @staticmethod
+    def _quantize_histogram(hist):
+        """
+        Quantize histogram counts to uint8, scaled so the peak bin is 255
+
+        Peak scaling keeps 8 bits of resolution for the dominant bins. Scaling
+        to sum=255 would average ~2.7 per bin over 96 bins and round most of
+        the colour signal away, so similarity normalizes by the sums instead.
+        """
+        import numpy as np
+        peak = hist.max()
+        if peak == 0:
+            return np.zeros(hist.shape, dtype=np.uint8)
+        return np.rint(hist * (255.0 / peak)).astype(np.uint8)
+
+    # Similarity components and the stacked array each one reads, cheapest
+    # first; scores are summed in this order
+    COMPONENTS = {'visual': 'p_hash', 'edge': 'edge_density', 'color': 'color_hist'}
+
+    # Fixed-point total of a stacked color histogram
+    HIST_SCALE = 65535
+
+    @staticmethod
+    def stack_features(features_list):
+        """
+        Stack feature dicts into contiguous per-feature arrays for top_matches
+
+        Histograms are normalized to distributions here, once, and stored as
+        uint16 fixed point (each row sums to about HIST_SCALE): half the bytes
+        of float32 to stream per comparison, for a score error below 1e-3.
+        Entries without features get zero rows and are flagged in 'valid'.
+        """
+        import numpy as np
+        n = len(features_list)
+        stacked = {
+            'valid': np.array([bool(f) for f in features_list], dtype=bool),
+            'p_hash': np.zeros((n, 4), dtype=np.uint64),
+            'color_hist': np.zeros((n, 96), dtype=np.uint16),
+            'edge_density': np.zeros(n, dtype=np.float32),
+        }
+
+        hists = np.zeros((n, 96), dtype=np.float32)
+        for i, features in enumerate(features_list):
+            if features:
+                stacked['p_hash'][i] = features['p_hash']
+                hists[i] = features['color_hist']
+                stacked['edge_density'][i] = features['edge_density']
+
+        valid = stacked['valid']
+        hists[valid] *= VisualFeatureExtractor.HIST_SCALE / hists[valid].sum(axis=1, keepdims=True)
+        stacked['color_hist'][:] = np.rint(hists)
+        return stacked
+
+    @staticmethod
+    def _component_scores(name, targets, refs):
+        """One similarity component between two stacks, as a float32 matrix"""
+        import numpy as np
+        if name == 'visual':
+            distances = HashUtils.hamming_distance(
+                targets['p_hash'][:, None, :], refs['p_hash'][None, :, :]
+            )
+            return np.maximum(0, 1 - distances.astype(np.float32) / 256)
+        if name == 'color':
+            # For normalized histograms 1 - L1/2 equals the histogram
+            # intersection, which needs one ufunc pass instead of two
+            intersection = np.minimum(targets['color_hist'][:, None, :], refs['color_hist'][None, :, :])
+            # Rounding can push a row's total a little past HIST_SCALE
+            return np.minimum(1, intersection.sum(axis=-1, dtype=np.uint32)
+                              / np.float32(VisualFeatureExtractor.HIST_SCALE))
+        edge_diff = np.abs(targets['edge_density'][:, None] - refs['edge_density'][None, :])
+        return np.maximum(0, 1 - np.minimum(edge_diff, 1))
+
+    @staticmethod
+    def top_matches(target, refs, threshold, weights=None, k=5):
+        """
+        Best k references scoring at least threshold against one stacked target
+
+        The score is the mean of the enabled components (pHash, edge density,
+        color histogram intersection), each in [0, 1]. References are dropped
+        as soon as they cannot reach the threshold even if every remaining
+        component scored 1, so the 96-bin color comparison only runs on the
+        references the cheap hash and edge scores leave in play.
+
+        Returns:
+            (reference indices, scores), best first, ties in reference order
+        """
+        import numpy as np
         if weights is None:
             weights = {
                 'visual': 0.4,
                 'color': 0.3,
                 'edge': 0.3
             }
+        names = [name for name in VisualFeatureExtractor.COMPONENTS if weights.get(name, 0) > 0]
+        if not target['valid'][0] or not names:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)
+
+        total = len(refs['valid'])
+        candidates = np.flatnonzero(refs['valid'])
+        partial = np.zeros(len(candidates), dtype=np.float32)
+        for done, name in enumerate(names, 1):
+            key = VisualFeatureExtractor.COMPONENTS[name]
+            # Skip the gather while every reference is still in play
+            subset = {key: refs[key] if len(candidates) == total else refs[key][candidates]}
+            partial += VisualFeatureExtractor._component_scores(name, target, subset)[0]
+            # Small slack so float rounding never prunes a reference that passes
+            keep = (partial + (len(names) - done)) / len(names) >= threshold - 1e-6
+            if not keep.all():
+                candidates, partial = candidates[keep], partial[keep]
+
+        scores = partial / len(names)
+        above = scores >= threshold
+        candidates, scores = candidates[above], scores[above]
+        if len(scores) > k:
+            # Partition down to the k best (plus ties) before the stable sort
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            near = np.flatnonzero(scores >= kth)
+            candidates, scores = candidates[near], scores[near]
+        best = np.argsort(-scores, kind='stable')[:k]
+        return candidates[best], scores[best]
+
+
+class FeatureCache:
+    """
+    On-disk cache of per-file analysis results, keyed by path + mtime + size
+
+    Holds extracted visual features and the EXIF date / GPS metadata read
+    for reference photos, so reloading an unchanged folder decodes nothing.
+    """
+
+    # Bump whenever the extract_features output changes so stale rows are dropped
+    FEATURE_VERSION = 5
+
+    TABLES = ('features', 'metadata')
+
+    # In-memory LRU size, in rows across both tables
+    MEMORY_ENTRIES = 4096
+
+    DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'smart_exif_restorer', 'features.db')
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or self.DEFAULT_PATH
+        self.conn = None
+        self.lock = threading.Lock()
+        # Recently used rows, so re-running analysis skips SQLite and unpickling
+        self.memory = OrderedDict()
 
-        scores = []
-        total_weight = 0
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            # The GUI also uses the cache from its analysis thread; self.lock
+            # serializes access to the shared connection
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+            if version != self.FEATURE_VERSION:
+                for table in self.TABLES:
+                    self.conn.execute(f'DROP TABLE IF EXISTS {table}')
+                self.conn.execute(f'PRAGMA user_version = {self.FEATURE_VERSION}')
+            for table in self.TABLES:
+                self.conn.execute(
+                    f'CREATE TABLE IF NOT EXISTS {table} '
+                    '(path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, blob BLOB)'
+                )
+            self.conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️  Feature cache disabled: {e}")
+            self.conn = None
+
+    def get(self, image_path: str) -> Optional[Dict]:
+        """Return cached features if the file is unchanged since they were stored"""
+        return self._get('features', image_path)
+
+    def put(self, image_path: str, features: Dict) -> None:
+        """Store features for a file (committed by commit())"""
+        self._put('features', image_path, features)
+
+    def get_many(self, image_paths: List[str]) -> Dict[str, Dict]:
+        """Cached features for every unchanged file in image_paths, looked up in batches"""
+        return self._get_many('features', image_paths)
+
+    def get_metadata(self, image_path: str) -> Optional[Tuple]:
+        """Return cached (exif_date, gps_coords) if the file is unchanged"""
+        return self._get('metadata', image_path)
+
+    def put_metadata(self, image_path: str, metadata: Tuple) -> None:
+        """Store (exif_date, gps_coords) for a file (committed by commit())"""
+        self._put('metadata', image_path, metadata)
+
+    def _get(self, table: str, image_path: str):
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        key = (table, os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
 
-        # Visual hash similarity
-        if weights.get('visual', 0) > 0:
-            hash_sim = 1 - (target_features['p_hash'] - ref_features['p_hash']) / 256.0
-            scores.append(max(0, hash_sim))
-            total_weight += weights['visual']
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+            if self.conn is None:
+                return None
 
-        # Color similarity
-        if weights.get('color', 0) > 0:
-            color_sim = 1 - np.sum(
-                np.abs(target_features['color_hist'] - ref_features['color_hist'])
-            ) / (2 * np.sum(target_features['color_hist']))
-            scores.append(max(0, color_sim))
-            total_weight += weights['color']
+            try:
+                row = self.conn.execute(
+                    f'SELECT mtime, size, blob FROM {table} WHERE path = ?', (key[1],)
+                ).fetchone()
+                if row and row[0] == key[2] and row[1] == key[3]:
+                    value = pickle.loads(row[2])
+                    self._remember(key, value)
+                    return value
+            except (sqlite3.Error, pickle.UnpicklingError):
+                pass
+        return None
 
-        # Edge similarity
-        if weights.get('edge', 0) > 0:
-            edge_diff = abs(target_features['edge_density'] - ref_features['edge_density'])
-            edge_sim = 1 - min(edge_diff, 1.0)
-            scores.append(max(0, edge_sim))
-            total_weight += weights['edge']
+    def _get_many(self, table: str, image_paths: List[str]) -> Dict:
+        keys = {}
+        for image_path in image_paths:
+            try:
+                stat = os.stat(image_path)
+            except OSError:
+                continue
+            keys[image_path] = (table, os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+
+        found = {}
+        with self.lock:
+            misses = []
+            for image_path, key in keys.items():
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[image_path] = self.memory[key]
+                else:
+                    misses.append(image_path)
+            if self.conn is None:
+                return found
 
-        if not scores or total_weight == 0:
-            return 0.0
+            # One query per batch instead of per file (SQLite allows 999 parameters)
+            for start in range(0, len(misses), 500):
+                batch = {keys[p][1]: p for p in misses[start:start + 500]}
+                try:
+                    rows = self.conn.execute(
+                        f'SELECT path, mtime, size, blob FROM {table} '
+                        f'WHERE path IN ({",".join("?" * len(batch))})', list(batch)
+                    ).fetchall()
+                except sqlite3.Error:
+                    continue
+                for path, mtime, size, blob in rows:
+                    image_path = batch[path]
+                    key = keys[image_path]
+                    if mtime == key[2] and size == key[3]:
+                        try:
+                            found[image_path] = pickle.loads(blob)
+                        except pickle.UnpicklingError:
+                            continue
+                        self._remember(key, found[image_path])
+        return found
+
+    def _put(self, table: str, image_path: str, value) -> None:
+        if value is None:
+            return
 
-        # Weighted average
-        weighted_score = sum(scores) / len(scores)
-        return weighted_score
+        try:
+            stat = os.stat(image_path)
+            key = (table, os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+            with self.lock:
+                self._remember(key, value)
+                if self.conn is not None:
+                    self.conn.execute(
+                        f'INSERT OR REPLACE INTO {table} (path, mtime, size, blob) VALUES (?, ?, ?, ?)',
+                        (key[1], key[2], key[3], pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+                    )
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️  Feature cache write failed for {image_path}: {e}")
+
+    def _remember(self, key, value) -> None:
+        """Keep a value in the in-memory LRU (caller holds self.lock)"""
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.MEMORY_ENTRIES:
+            self.memory.popitem(last=False)
+
+    def commit(self) -> None:
+        """Flush pending writes"""
+        if self.conn is not None:
+            try:
+                with self.lock:
+                    self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️  Feature cache commit failed: {e}")
+
+
+def _extract_one(image_path):
+    """Process-pool entry point (module level so it pickles): returns (features, error)"""
+    try:
+        return VisualFeatureExtractor._extract_features(image_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _read_metadata(image_path):
+    """Process-pool entry point: (exif_date, gps_coords) of one photo"""
+    return ExifUtils.get_exif_datetime(image_path), ExifUtils.get_gps_coords(image_path)
+
+
+def _map_in_pool(func, items, workers=None, min_items=32):
+    """
+    List of func(item) for every item, in order, using a process pool
+
+    func must be module level so it pickles. Small batches run inline, where
+    starting the workers would cost more than it saves.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(items) < min_items:
+        return [func(item) for item in items]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, min(16, len(items) // (4 * workers)))
+        return list(executor.map(func, items, chunksize=chunksize))
+
+
+def _decode_thumbnail(image_path, size=(150, 150)):
+    """
+    Decode a small RGB thumbnail for a photo card, or None if unreadable
+
+    draft() makes libjpeg emit a 1/2-1/8 scaled IDCT directly (in RGB, so CMYK
+    and YCCK JPEGs need no conversion pass); the remaining <=2x step uses a
+    bilinear filter since the output is only a preview.
+    """
+    try:
+        img = Image.open(image_path)
+        img.draft('RGB', (size[0] * 2, size[1] * 2))
+        img.thumbnail(size, Image.BILINEAR)
+        return img
+    except Exception:
+        return None
 
 
 # =============================================================================
@@ -1123,7 +2103,15 @@ class VisualFeatureExtractor:
 class SmartExifRestorerGUI:
     """GUI for Smart EXIF Restorer"""
 
-    def __init__(self, root):
+    # Photo grid layout: cards per row and the fixed cell size virtualization relies on
+    GRID_COLS = 3
+    CARD_WIDTH = 180
+    CARD_HEIGHT = 260
+
+    # Thumbnails kept decoded (~90 KB each); far more than fit on screen at once
+    THUMB_CACHE_SIZE = 600
+
+    def __init__(self, root, workers=None):
         self.root = root
         self.root.title("AI Smart EXIF Restorer")
         self.root.geometry("1600x900")
@@ -1134,10 +2122,32 @@ class SmartExifRestorerGUI:
         self.target_photos = []
         self.reference_photos = []
         self.selected_targets = []
+        # id() of every dict in selected_targets, for O(1) membership checks
+        self._selected_ids = set()
         self.analysis_results = []
+        self._ref_stack = None
+        self._photo_grids = {}
+
+        # Thumbnails decode off the Tk thread; results come back through a queue
+        self._thumb_pool = ThreadPoolExecutor(max_workers=4)
+        self._thumb_queue = queue.Queue()
+        self._thumb_pending = 0
+        # Decoded thumbnails by path (LRU), shared across reloads of the same folders
+        self._thumb_cache = OrderedDict()
+
+        # Analysis runs on a worker thread and reports back through a queue
+        self._analysis_thread = None
+        self._analysis_queue = queue.Queue()
+        # Likewise for writing EXIF; Cancel stops whichever of the two is running
+        self._apply_thread = None
+        self._apply_queue = queue.Queue()
+        self._cancel_flag = threading.Event()
+        self._thumb_polling = False
 
         # Feature extractor
         self.extractor = VisualFeatureExtractor()
+        self.workers = workers
+        self.feature_cache = FeatureCache()
 
         self._setup_ui()
 
@@ -1199,8 +2209,7 @@ class SmartExifRestorerGUI:
         self.ref_count_label = ttk.Label(ref_tools, text="Total: 0", foreground="green", font=("Arial", 9, "bold"))
         self.ref_count_label.pack(side=tk.RIGHT, padx=5)
 
-        ref_scroll = self._create_scroll_frame(reference_frame)
-        self.reference_canvas, self.reference_content = ref_scroll
+        self.reference_canvas = self._create_scroll_frame(reference_frame)
 
         # Middle: AI analysis controls
         middle_frame = ttk.Frame(content_frame, width=200)
@@ -1243,6 +2252,10 @@ class SmartExifRestorerGUI:
                                       command=self._run_analysis, state=tk.DISABLED)
         self.analyze_btn.pack(pady=10, fill=tk.X)
 
+        self.cancel_btn = ttk.Button(middle_frame, text="⏹ Cancel",
+                                     command=self._cancel_analysis, state=tk.DISABLED)
+        self.cancel_btn.pack(pady=(0, 10), fill=tk.X)
+
         self.apply_btn = ttk.Button(middle_frame, text="💾 Apply EXIF",
                                    command=self._apply_exif, state=tk.DISABLED)
         self.apply_btn.pack(pady=5, fill=tk.X)
@@ -1263,8 +2276,7 @@ class SmartExifRestorerGUI:
         self.target_count_label = ttk.Label(target_tools, text="Selected: 0", foreground="blue", font=("Arial", 9, "bold"))
         self.target_count_label.pack(side=tk.RIGHT, padx=5)
 
-        target_scroll = self._create_scroll_frame(target_frame)
-        self.target_canvas, self.target_content = target_scroll
+        self.target_canvas = self._create_scroll_frame(target_frame)
 
         # Bottom: Results preview
         result_frame = ttk.LabelFrame(self.root, text="📋 Analysis Results", padding="10")
@@ -1282,22 +2294,25 @@ class SmartExifRestorerGUI:
         self.progress_label = ttk.Label(self.progress_frame, text="")
 
     def _create_scroll_frame(self, parent):
-        """Create scrollable frame"""
+        """Create scrollable canvas for a virtualized photo grid (see _show_photo_grid)"""
         scroll_frame = ttk.Frame(parent)
         scroll_frame.pack(fill=tk.BOTH, expand=True)
 
         canvas = tk.Canvas(scroll_frame, bg="white")
         scrollbar = ttk.Scrollbar(scroll_frame, orient="vertical", command=canvas.yview)
-        content = ttk.Frame(canvas)
 
-        canvas.configure(yscrollcommand=scrollbar.set)
+        def on_scroll(*args):
+            # Called on every view change (scrollbar, wheel, resize)
+            scrollbar.set(*args)
+            self._schedule_render(canvas)
+
+        canvas.configure(yscrollcommand=on_scroll)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        canvas.create_window((0, 0), window=content, anchor="nw")
-
-        content.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        canvas.bind("<Configure>", lambda e: self._schedule_render(canvas))
 
-        return canvas, content
+        self._photo_grids[canvas] = {'photos': [], 'is_target': False, 'rows': {}, 'render_pending': False}
+        return canvas
 
     def _update_threshold_label(self, *args):
         """Update threshold label"""
@@ -1331,40 +2346,66 @@ class SmartExifRestorerGUI:
 
         # Load target photos
         self.target_photos = []
-        for root, _, files in os.walk(self.target_folder):
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg')):
-                    path = os.path.join(root, file)
-                    exif_date = ExifUtils.get_exif_datetime(path)
-                    gps_coords = ExifUtils.get_gps_coords(path)
-                    self.target_photos.append({
-                        'path': path,
-                        'filename': file,
-                        'selected': False,
-                        'exif_date': exif_date,
-                        'gps_coords': gps_coords
-                    })
+        # Targets are written back with piexif, so only JPEGs qualify
+        target_dirs = ExifUtils.iter_photo_dirs(self.target_folder,
+                                                lambda name: name.lower().endswith(('.jpg', '.jpeg')))
+        for entry in (entry for _, entries in target_dirs for entry in entries):
+            exif_date = ExifUtils.get_exif_datetime(entry.path)
+            gps_coords = ExifUtils.get_gps_coords(entry.path)
+            self.target_photos.append({
+                'path': entry.path,
+                'filename': entry.name,
+                'selected': False,
+                'exif_date': exif_date,
+                'gps_coords': gps_coords
+            })
 
         # Load reference photos if needed
         if mode in ["visual", "hybrid"]:
-            self.reference_photos = []
-            for root, _, files in os.walk(self.reference_folder):
-                for file in files:
-                    if file.lower().endswith(ExifUtils.SUPPORTED_FORMATS):
-                        path = os.path.join(root, file)
-                        exif_date = ExifUtils.get_exif_datetime(path)
-                        gps_coords = ExifUtils.get_gps_coords(path)
-                        features = self.extractor.extract_features(path)
-
-                        self.reference_photos.append({
-                            'path': path,
-                            'filename': file,
-                            'exif_date': exif_date,
-                            'gps_coords': gps_coords,
-                            'features': features
-                        })
+            # Built locally and published once sorted and stacked, so nothing
+            # sees a half-loaded list
+            reference_photos = []
+            entries = [entry for _, dir_entries in ExifUtils.iter_photo_dirs(self.reference_folder)
+                       for entry in dir_entries]
+
+            # EXIF date/GPS: cached where possible, the rest parsed in the process pool
+            metadata = {}
+            misses = []
+            for entry in entries:
+                cached = self.feature_cache.get_metadata(entry.path)
+                if cached is None:
+                    misses.append(entry.path)
+                else:
+                    metadata[entry.path] = cached
+            for path, read in zip(misses, _map_in_pool(_read_metadata, misses, self.workers)):
+                metadata[path] = read
+                self.feature_cache.put_metadata(path, read)
+
+            for entry in entries:
+                exif_date, gps_coords = metadata[entry.path]
+                reference_photos.append({
+                    'path': entry.path,
+                    'filename': entry.name,
+                    'exif_date': exif_date,
+                    'gps_coords': gps_coords,
+                    'features': None
+                })
 
-            self.reference_photos.sort(key=lambda x: x.get('exif_date') or datetime.min)
+            # Extract reference features in parallel
+            ref_paths = [ref['path'] for ref in reference_photos]
+            total = len(ref_paths)
+            for i, (ref, features) in enumerate(zip(reference_photos,
+                                                    self.extractor.iter_features(ref_paths, self.workers, self.feature_cache))):
+                ref['features'] = features
+                # Redraw the status without redrawing for every photo; idle tasks
+                # only, so no click handler runs against the half-built list
+                if (i + 1) % 16 == 0 or i + 1 == total:
+                    self.status_label.config(text=f"Extracting reference features: {i+1}/{total}")
+                    self.root.update_idletasks()
+
+            reference_photos.sort(key=lambda x: x.get('exif_date') or datetime.min)
+            self.reference_photos = reference_photos
+            self._stack_reference_features()
 
         self._display_target_photos()
         if mode in ["visual", "hybrid"]:
@@ -1378,33 +2419,67 @@ class SmartExifRestorerGUI:
 
     def _display_target_photos(self):
         """Display target photos in grid"""
-        for widget in self.target_content.winfo_children():
-            widget.destroy()
-
-        row, col = 0, 0
-        max_cols = 3
-
-        for photo in self.target_photos:
-            self._create_photo_card(self.target_content, photo, row, col, is_target=True)
-            col += 1
-            if col >= max_cols:
-                col = 0
-                row += 1
+        self._show_photo_grid(self.target_canvas, self.target_photos, is_target=True)
 
     def _display_reference_photos(self):
         """Display reference photos in grid"""
-        for widget in self.reference_content.winfo_children():
-            widget.destroy()
+        self._show_photo_grid(self.reference_canvas, self.reference_photos, is_target=False)
 
-        row, col = 0, 0
-        max_cols = 3
+    def _show_photo_grid(self, canvas, photos, is_target):
+        """
+        Show photos in a scrollable grid, creating card widgets only for visible rows
 
-        for photo in self.reference_photos:
-            self._create_photo_card(self.reference_content, photo, row, col, is_target=False)
-            col += 1
-            if col >= max_cols:
-                col = 0
-                row += 1
+        Every row has a fixed height, so the scroll region is known up front and
+        rows are created/destroyed as they enter/leave the viewport.
+        """
+        grid = self._photo_grids[canvas]
+        for item, frame in grid['rows'].values():
+            frame.destroy()
+        canvas.delete("all")
+
+        grid['photos'] = list(photos)
+        grid['is_target'] = is_target
+        grid['rows'] = {}
+
+        row_count = -(-len(photos) // self.GRID_COLS)
+        canvas.configure(scrollregion=(0, 0, self.GRID_COLS * self.CARD_WIDTH, row_count * self.CARD_HEIGHT))
+        canvas.yview_moveto(0)
+        self._render_visible_rows(canvas)
+
+    def _schedule_render(self, canvas):
+        """Coalesce a burst of scroll/resize events into one _render_visible_rows when idle"""
+        grid = self._photo_grids[canvas]
+        if not grid['render_pending']:
+            grid['render_pending'] = True
+            self.root.after_idle(self._render_visible_rows, canvas)
+
+    def _render_visible_rows(self, canvas):
+        """Create rows in (or one row around) the viewport and drop the rest"""
+        grid = self._photo_grids[canvas]
+        grid['render_pending'] = False
+        photos = grid['photos']
+        row_count = -(-len(photos) // self.GRID_COLS)
+
+        top = canvas.canvasy(0)
+        first = max(0, int(top // self.CARD_HEIGHT) - 1)
+        last = min(row_count - 1, int((top + canvas.winfo_height()) // self.CARD_HEIGHT) + 1)
+
+        for row in [r for r in grid['rows'] if r < first or r > last]:
+            item, frame = grid['rows'].pop(row)
+            canvas.delete(item)
+            frame.destroy()
+
+        for row in range(first, last + 1):
+            if row in grid['rows']:
+                continue
+            frame = ttk.Frame(canvas)
+            start = row * self.GRID_COLS
+            for col, photo in enumerate(photos[start:start + self.GRID_COLS]):
+                frame.grid_columnconfigure(col, minsize=self.CARD_WIDTH)
+                self._create_photo_card(frame, photo, 0, col, is_target=grid['is_target'])
+            item = canvas.create_window(0, row * self.CARD_HEIGHT, window=frame, anchor="nw",
+                                        height=self.CARD_HEIGHT)
+            grid['rows'][row] = (item, frame)
 
     def _create_photo_card(self, parent, photo, row, col, is_target=True):
         """Create photo card widget"""
@@ -1416,21 +2491,23 @@ class SmartExifRestorerGUI:
         if is_selected:
             card.config(relief=tk.SOLID, borderwidth=3)
 
-        # Thumbnail
-        try:
-            img = Image.open(photo['path'])
-            img.thumbnail((150, 150))
-            photo_img = ImageTk.PhotoImage(img)
-
-            img_label = tk.Label(card, image=photo_img, cursor="hand2")
-            img_label.image = photo_img
-            img_label.pack()
+        # Thumbnail (decoded in the background, LRU-cached by path across redraws and reloads)
+        thumb = self._thumb_cache.get(photo['path'])
+        if photo.get('thumb_failed'):
+            img_label = tk.Label(card, text="Load failed", fg="red")
+        elif thumb is not None:
+            self._thumb_cache.move_to_end(photo['path'])
+            img_label = tk.Label(card, image=thumb, cursor="hand2")
+            # The label holds its own reference, so LRU eviction never blanks a visible card
+            img_label.image = thumb
+        else:
+            img_label = tk.Label(card, text="Loading...", width=20, height=9, cursor="hand2")
+            self._request_thumbnail(photo)
+        img_label.pack()
+        photo['thumb_label'] = img_label
 
-            if is_target:
-                img_label.bind("<Button-1>", lambda e, p=photo: self._toggle_selection(p))
-        except:
-            error_label = tk.Label(card, text="Load failed", fg="red")
-            error_label.pack()
+        if is_target:
+            img_label.bind("<Button-1>", lambda e, p=photo: self._toggle_selection(p))
 
         # Filename
         filename_label = tk.Label(card, text=photo['filename'][:20], font=("Arial", 8))
@@ -1465,34 +2542,99 @@ class SmartExifRestorerGUI:
             )
             gps_label.pack()
 
-        # Status
-        if is_target and is_selected:
+        # Status (kept on the card so _refresh_card can show/hide it)
+        if is_target:
             select_mark = tk.Label(card, text="✓ Selected", fg="blue", font=("Arial", 9, "bold"), bg="yellow")
-            select_mark.pack()
+            if is_selected:
+                select_mark.pack()
+            photo['select_mark'] = select_mark
 
         photo['card'] = card
 
+    def _request_thumbnail(self, photo):
+        """Queue a background thumbnail decode for a photo (once)"""
+        if photo.get('thumb_pending'):
+            return
+        photo['thumb_pending'] = True
+        self._thumb_pending += 1
+
+        def decode():
+            self._thumb_queue.put((photo, _decode_thumbnail(photo['path'])))
+
+        self._thumb_pool.submit(decode)
+        if not self._thumb_polling:
+            self._thumb_polling = True
+            self.root.after(50, self._install_thumbnails)
+
+    def _install_thumbnails(self):
+        """Turn decoded thumbnails into PhotoImages on the Tk thread and show them"""
+        while True:
+            try:
+                photo, img = self._thumb_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            photo['thumb_pending'] = False
+            self._thumb_pending -= 1
+            label = photo.get('thumb_label')
+            if img is None:
+                photo['thumb_failed'] = True
+                if label is not None and label.winfo_exists():
+                    label.config(text="Load failed", fg="red", width=0, height=0, cursor="")
+                continue
+
+            thumb = ImageTk.PhotoImage(img)
+            self._thumb_cache[photo['path']] = thumb
+            if len(self._thumb_cache) > self.THUMB_CACHE_SIZE:
+                self._thumb_cache.popitem(last=False)
+            if label is not None and label.winfo_exists():
+                label.config(image=thumb, text="", width=0, height=0)
+                label.image = thumb
+
+        if self._thumb_pending:
+            self.root.after(50, self._install_thumbnails)
+        else:
+            self._thumb_polling = False
+
+    def _refresh_card(self, photo):
+        """Update a target card's selection look in place"""
+        if photo.get('selected', False):
+            photo['card'].config(relief=tk.SOLID, borderwidth=3)
+            photo['select_mark'].pack()
+        else:
+            photo['card'].config(relief=tk.RAISED, borderwidth=2)
+            photo['select_mark'].pack_forget()
+
     def _toggle_selection(self, photo):
         """Toggle photo selection"""
         photo['selected'] = not photo.get('selected', False)
 
         if photo['selected']:
-            if photo not in self.selected_targets:
+            if id(photo) not in self._selected_ids:
+                self._selected_ids.add(id(photo))
                 self.selected_targets.append(photo)
         else:
-            if photo in self.selected_targets:
-                self.selected_targets.remove(photo)
+            if id(photo) in self._selected_ids:
+                self._selected_ids.discard(id(photo))
+                # By identity: list.remove would compare dict contents
+                self.selected_targets = [p for p in self.selected_targets if p is not photo]
 
-        self._display_target_photos()
+        self._refresh_card(photo)
         self.target_count_label.config(text=f"Selected: {len(self.selected_targets)}")
 
-        self.analyze_btn.config(state=tk.NORMAL if len(self.selected_targets) > 0 else tk.DISABLED)
+        self._update_analyze_button()
+
+    def _update_analyze_button(self):
+        """Enable Analyze when targets are selected and no analysis or EXIF write is running"""
+        busy = self._analysis_thread is not None or self._apply_thread is not None
+        self.analyze_btn.config(state=tk.NORMAL if self.selected_targets and not busy else tk.DISABLED)
 
     def _clear_target_selection(self):
         """Clear all selections"""
         for photo in self.selected_targets:
             photo['selected'] = False
         self.selected_targets.clear()
+        self._selected_ids.clear()
         self._display_target_photos()
         self.target_count_label.config(text="Selected: 0")
         self.analyze_btn.config(state=tk.DISABLED)
@@ -1501,71 +2643,30 @@ class SmartExifRestorerGUI:
         """Select all targets"""
         for photo in self.target_photos:
             photo['selected'] = True
-            if photo not in self.selected_targets:
+            if id(photo) not in self._selected_ids:
+                self._selected_ids.add(id(photo))
                 self.selected_targets.append(photo)
         self._display_target_photos()
         self.target_count_label.config(text=f"Selected: {len(self.selected_targets)}")
-        self.analyze_btn.config(state=tk.NORMAL)
+        self._update_analyze_button()
 
     def _filter_has_exif(self):
         """Filter to show only photos with EXIF data"""
-        for widget in self.target_content.winfo_children():
-            widget.destroy()
-
-        row, col = 0, 0
-        max_cols = 3
-        count = 0
-
-        for photo in self.target_photos:
-            if photo.get('exif_date'):
-                self._create_photo_card(self.target_content, photo, row, col, is_target=True)
-                col += 1
-                count += 1
-                if col >= max_cols:
-                    col = 0
-                    row += 1
-
-        self.target_count_label.config(text=f"Showing: {count} with EXIF")
+        photos = [photo for photo in self.target_photos if photo.get('exif_date')]
+        self._show_photo_grid(self.target_canvas, photos, is_target=True)
+        self.target_count_label.config(text=f"Showing: {len(photos)} with EXIF")
 
     def _filter_no_exif(self):
         """Filter to show only photos without EXIF data"""
-        for widget in self.target_content.winfo_children():
-            widget.destroy()
-
-        row, col = 0, 0
-        max_cols = 3
-        count = 0
-
-        for photo in self.target_photos:
-            if not photo.get('exif_date'):
-                self._create_photo_card(self.target_content, photo, row, col, is_target=True)
-                col += 1
-                count += 1
-                if col >= max_cols:
-                    col = 0
-                    row += 1
-
-        self.target_count_label.config(text=f"Showing: {count} without EXIF")
+        photos = [photo for photo in self.target_photos if not photo.get('exif_date')]
+        self._show_photo_grid(self.target_canvas, photos, is_target=True)
+        self.target_count_label.config(text=f"Showing: {len(photos)} without EXIF")
 
     def _filter_has_gps(self):
         """Filter to show only photos with GPS data"""
-        for widget in self.target_content.winfo_children():
-            widget.destroy()
-
-        row, col = 0, 0
-        max_cols = 3
-        count = 0
-
-        for photo in self.target_photos:
-            if photo.get('gps_coords'):
-                self._create_photo_card(self.target_content, photo, row, col, is_target=True)
-                col += 1
-                count += 1
-                if col >= max_cols:
-                    col = 0
-                    row += 1
-
-        self.target_count_label.config(text=f"Showing: {count} with GPS")
+        photos = [photo for photo in self.target_photos if photo.get('gps_coords')]
+        self._show_photo_grid(self.target_canvas, photos, is_target=True)
+        self.target_count_label.config(text=f"Showing: {len(photos)} with GPS")
 
     def _filter_show_all(self):
         """Show all photos"""
@@ -1576,15 +2677,39 @@ class SmartExifRestorerGUI:
         """Sort reference photos"""
         if sort_by == "date":
             self.reference_photos.sort(key=lambda x: x.get('exif_date') or datetime.min)
+            self._stack_reference_features()
         self._display_reference_photos()
 
+    def _stack_reference_features(self):
+        """Precompute reference feature matrices (rows follow self.reference_photos)"""
+        self._ref_stack = self.extractor.stack_features(
+            [ref['features'] for ref in self.reference_photos]
+        )
+
     def _run_analysis(self):
-        """Run AI analysis"""
+        """Run AI analysis on a worker thread; results come back via _drain_analysis_queue"""
         if not self.selected_targets:
             messagebox.showwarning("Warning", "Please select target photos!")
             return
+        if self._analysis_thread is not None or self._apply_thread is not None:
+            return
 
-        mode = self.processing_mode.get()
+        # Read Tk variables here: the worker thread must not touch Tk
+        settings = {
+            'mode': self.processing_mode.get(),
+            'time_mode': self.time_mode.get(),
+            'threshold': self.similarity_threshold.get(),
+            'weights': {
+                'visual': 0.4 if self.use_visual.get() else 0,
+                'color': 0.3 if self.use_color.get() else 0,
+                'edge': 0.3 if self.use_edge.get() else 0
+            },
+            # Copied here, on the Tk thread: sorting or reloading the references
+            # during analysis must not shift the rows ref_stack indexes into
+            'reference_photos': list(self.reference_photos),
+            'ref_stack': self._ref_stack,
+        }
+        targets = list(self.selected_targets)
 
         # Show progress
         self.progress_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -1592,33 +2717,90 @@ class SmartExifRestorerGUI:
         self.progress_label.pack()
 
         self.analysis_results = []
-        total = len(self.selected_targets)
+        self.analyze_btn.config(state=tk.DISABLED)
+        self.apply_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
 
         self.result_text.delete(1.0, tk.END)
         self.result_text.insert(tk.END, "=== AI Analysis Started ===\n\n")
 
-        if mode == "folder":
-            self._run_folder_date_analysis(total)
-        else:
-            self._run_visual_analysis(total)
+        self._cancel_flag.clear()
+        self._analysis_thread = threading.Thread(
+            target=self._analysis_worker, args=(targets, settings), daemon=True
+        )
+        self._analysis_thread.start()
+        self.root.after(50, self._drain_analysis_queue)
+
+    def _cancel_analysis(self):
+        """Ask the analysis (or EXIF write) worker to stop after the current photo"""
+        self._cancel_flag.set()
+        self.cancel_btn.config(state=tk.DISABLED)
+
+    def _analysis_worker(self, targets, settings):
+        """Worker thread: run the analysis, posting messages to self._analysis_queue"""
+        try:
+            if settings['mode'] == "folder":
+                self._run_folder_date_analysis(targets)
+            else:
+                self._run_visual_analysis(targets, settings)
+        except Exception as e:
+            self._analysis_queue.put(('row', f"❌ Analysis failed: {e}\n", None))
+        finally:
+            self._analysis_queue.put(('done', self._cancel_flag.is_set()))
+
+    def _drain_analysis_queue(self):
+        """Apply worker messages on the Tk thread"""
+        while True:
+            try:
+                message = self._analysis_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if message[0] == 'progress':
+                _, i, total, filename = message
+                self.progress_bar['value'] = i / total * 100
+                self.progress_label.config(text=f"Analyzing: {i}/{total} - {filename}")
+            elif message[0] == 'row':
+                _, text, result = message
+                self.result_text.insert(tk.END, text)
+                if result is not None:
+                    self.analysis_results.append(result)
+            else:
+                self._finish_analysis(cancelled=message[1])
+                return
+
+        self.root.after(50, self._drain_analysis_queue)
+
+    def _finish_analysis(self, cancelled):
+        """Restore the UI once the worker is done"""
+        self._analysis_thread = None
 
         # Hide progress
         self.progress_bar.pack_forget()
         self.progress_label.pack_forget()
         self.progress_frame.pack_forget()
 
-        self.result_text.insert(tk.END, f"\n=== Analysis Complete: {len(self.analysis_results)} photos ===\n")
+        status = "Cancelled" if cancelled else "Complete"
+        self.result_text.insert(tk.END, f"\n=== Analysis {status}: {len(self.analysis_results)} photos ===\n")
+
+        self.cancel_btn.config(state=tk.DISABLED)
+        self._update_analyze_button()
+        if self.analysis_results:
+            self.apply_btn.config(state=tk.NORMAL)
+        messagebox.showinfo(status, f"Analysis {status.lower()}!\nProcessed {len(self.analysis_results)} photos")
 
-        self.apply_btn.config(state=tk.NORMAL)
-        messagebox.showinfo("Complete", f"Analysis complete!\nProcessed {len(self.analysis_results)} photos")
+    def _post_progress(self, i, total, filename):
+        """Post a progress update about 100 times per run rather than once per photo"""
+        if i % max(1, total // 100) == 0 or i == total:
+            self._analysis_queue.put(('progress', i, total, filename))
 
-    def _run_folder_date_analysis(self, total):
-        """Run folder date analysis"""
-        for i, target_photo in enumerate(self.selected_targets):
-            progress = (i + 1) / total * 100
-            self.progress_bar['value'] = progress
-            self.progress_label.config(text=f"Analyzing: {i+1}/{total} - {target_photo['filename']}")
-            self.root.update()
+    def _run_folder_date_analysis(self, targets):
+        """Run folder date analysis (worker thread)"""
+        total = len(targets)
+        for i, target_photo in enumerate(targets):
+            if self._cancel_flag.is_set():
+                break
+            self._post_progress(i + 1, total, target_photo['filename'])
 
             # Extract date from path
             folder_path = os.path.dirname(target_photo['path'])
@@ -1632,7 +2814,7 @@ class SmartExifRestorerGUI:
                 # Preserve existing GPS if available
                 gps_coords = target_photo.get('gps_coords')
 
-                self.analysis_results.append({
+                result = {
                     'target': target_photo,
                     'estimated_exif': {
                         'datetime': folder_date,
@@ -1641,78 +2823,76 @@ class SmartExifRestorerGUI:
                         'full_exif': None,
                         'gps_coords': gps_coords
                     }
-                })
+                }
 
-                self.result_text.insert(tk.END, f"📷 {target_photo['filename']}\n")
-                self.result_text.insert(tk.END, f"   Date: {folder_date}\n")
-                self.result_text.insert(tk.END, f"   Source: Folder name\n")
+                lines = [f"📷 {target_photo['filename']}\n",
+                         f"   Date: {folder_date}\n",
+                         f"   Source: Folder name\n"]
                 if gps_coords:
-                    self.result_text.insert(tk.END, f"   GPS: {gps_coords['lat']:.4f}, {gps_coords['lon']:.4f} (preserved)\n")
-                self.result_text.insert(tk.END, "\n")
+                    lines.append(f"   GPS: {gps_coords['lat']:.4f}, {gps_coords['lon']:.4f} (preserved)\n")
+                lines.append("\n")
+                self._analysis_queue.put(('row', "".join(lines), result))
             else:
-                self.result_text.insert(tk.END, f"⚠️  {target_photo['filename']}\n")
-                self.result_text.insert(tk.END, f"   No date detected in path\n\n")
-
-    def _run_visual_analysis(self, total):
-        """Run visual similarity analysis"""
-        for i, target_photo in enumerate(self.selected_targets):
-            progress = (i + 1) / total * 100
-            self.progress_bar['value'] = progress
-            self.progress_label.config(text=f"Analyzing: {i+1}/{total} - {target_photo['filename']}")
-            self.root.update()
+                self._analysis_queue.put(
+                    ('row', f"⚠️  {target_photo['filename']}\n   No date detected in path\n\n", None)
+                )
+
+    def _run_visual_analysis(self, targets, settings):
+        """Run visual similarity analysis (worker thread)"""
+        reference_photos = settings['reference_photos']
+        ref_stack = settings['ref_stack']
+        if ref_stack is None:
+            # No references loaded yet (e.g. photos were loaded in folder mode)
+            ref_stack = self.extractor.stack_features([])
+        total = len(targets)
+
+        # Extract features in a process pool; results arrive in target order
+        target_paths = [target['path'] for target in targets]
+        feature_iter = self.extractor.iter_features(target_paths, self.workers, self.feature_cache)
 
-            # Extract features
-            target_features = self.extractor.extract_features(target_photo['path'])
-
-            if not target_features:
-                continue
+        try:
+            for i, (target_photo, target_features) in enumerate(zip(targets, feature_iter)):
+                if self._cancel_flag.is_set():
+                    break
+                self._post_progress(i + 1, total, target_photo['filename'])
 
-            # Calculate similarities
-            similarities = []
-            for ref_photo in self.reference_photos:
-                if ref_photo['features']:
-                    sim_score = self.extractor.calculate_similarity(
-                        target_features,
-                        ref_photo['features'],
-                        {
-                            'visual': 0.4 if self.use_visual.get() else 0,
-                            'color': 0.3 if self.use_color.get() else 0,
-                            'edge': 0.3 if self.use_edge.get() else 0
-                        }
-                    )
-                    if sim_score >= self.similarity_threshold.get():
-                        similarities.append({
-                            'ref_photo': ref_photo,
-                            'similarity': sim_score
-                        })
-
-            # Sort and get top matches
-            similarities.sort(key=lambda x: x['similarity'], reverse=True)
-            top_matches = similarities[:5]
-
-            # Estimate EXIF
-            estimated_exif = self._estimate_exif(target_photo, top_matches)
-
-            self.analysis_results.append({
-                'target': target_photo,
-                'matches': top_matches,
-                'estimated_exif': estimated_exif
-            })
+                if not target_features:
+                    continue
 
-            # Display results
-            self.result_text.insert(tk.END, f"📷 {target_photo['filename']}\n")
-            self.result_text.insert(tk.END, f"   Found {len(top_matches)} similar photos\n")
-            if estimated_exif:
-                self.result_text.insert(tk.END, f"   Estimated: {estimated_exif['datetime']}\n")
-                self.result_text.insert(tk.END, f"   Confidence: {estimated_exif['confidence']:.2%}\n")
-            self.result_text.insert(tk.END, "\n")
+                # Top matches against the precomputed reference matrices
+                best, scores = self.extractor.top_matches(
+                    self.extractor.stack_features([target_features]), ref_stack,
+                    settings['threshold'], settings['weights']
+                )
+                top_matches = [
+                    {'ref_photo': reference_photos[j], 'similarity': float(score)}
+                    for j, score in zip(best.tolist(), scores.tolist())
+                ]
 
-    def _estimate_exif(self, target_photo, matches):
-        """Estimate EXIF from matches"""
+                # Estimate EXIF
+                estimated_exif = self._estimate_exif(target_photo, top_matches, settings['time_mode'])
+
+                # Display results (one Text insert per target)
+                lines = [f"📷 {target_photo['filename']}\n",
+                         f"   Found {len(top_matches)} similar photos\n"]
+                if estimated_exif:
+                    lines.append(f"   Estimated: {estimated_exif['datetime']}\n")
+                    lines.append(f"   Confidence: {estimated_exif['confidence']:.2%}\n")
+                lines.append("\n")
+                self._analysis_queue.put(('row', "".join(lines), {
+                    'target': target_photo,
+                    'matches': top_matches,
+                    'estimated_exif': estimated_exif
+                }))
+        finally:
+            # Stops the process pool (dropping queued images) when cancelled
+            feature_iter.close()
+
+    def _estimate_exif(self, target_photo, matches, mode):
+        """Estimate EXIF from matches using the given time mode"""
         if not matches:
             return None
 
-        mode = self.time_mode.get()
         # Get GPS from best match if available
         gps_coords = matches[0]['ref_photo'].get('gps_coords')
 
@@ -1738,7 +2918,11 @@ class SmartExifRestorerGUI:
                     weights.append(match['similarity'])
 
             if datetimes:
-                avg_datetime = datetimes[0]  # Simplified
+                # Similarity-weighted mean, as offsets from the first time
+                # (avoids epoch conversion of naive EXIF datetimes)
+                anchor = datetimes[0]
+                offset = sum(w * (dt - anchor).total_seconds() for dt, w in zip(datetimes, weights)) / sum(weights)
+                avg_datetime = anchor + timedelta(seconds=round(offset))
                 return {
                     'datetime': avg_datetime,
                     'confidence': sum(weights) / len(weights),
@@ -1751,8 +2935,8 @@ class SmartExifRestorerGUI:
             if len(matches) >= 2:
                 times = [m['ref_photo']['exif_date'] for m in matches[:3] if m['ref_photo']['exif_date']]
                 if len(times) >= 2:
-                    times.sort()
-                    mid_time = times[0] + (times[-1] - times[0]) / 2
+                    earliest, latest = min(times), max(times)
+                    mid_time = earliest + (latest - earliest) / 2
 
                     return {
                         'datetime': mid_time,
@@ -1765,15 +2949,17 @@ class SmartExifRestorerGUI:
         return None
 
     def _apply_exif(self):
-        """Apply estimated EXIF to photos"""
+        """Apply estimated EXIF to photos on a worker thread; progress comes back via _drain_apply_queue"""
         if not self.analysis_results:
             messagebox.showwarning("Warning", "No analysis results!")
             return
+        if self._apply_thread is not None or self._analysis_thread is not None:
+            return
 
-        count = len([r for r in self.analysis_results if r['estimated_exif']])
+        pending = [result for result in self.analysis_results if result['estimated_exif']]
 
         if not messagebox.askyesno("Confirm",
-            f"Will write EXIF to {count} photos\nOriginal files will be backed up\n\nContinue?"):
+            f"Will write EXIF to {len(pending)} photos\nOriginal files will be backed up\n\nContinue?"):
             return
 
         # Show progress
@@ -1781,48 +2967,109 @@ class SmartExifRestorerGUI:
         self.progress_bar.pack(fill=tk.X)
         self.progress_label.pack()
 
-        success = 0
-        total = len(self.analysis_results)
-
-        for i, result in enumerate(self.analysis_results):
-            progress = (i + 1) / total * 100
-            self.progress_bar['value'] = progress
-            self.progress_label.config(text=f"Writing: {i+1}/{total}")
-            self.root.update()
-
-            if not result['estimated_exif']:
-                continue
+        self.analyze_btn.config(state=tk.DISABLED)
+        self.apply_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
 
-            target_path = result['target']['path']
+        self._cancel_flag.clear()
+        self._apply_thread = threading.Thread(target=self._apply_worker, args=(pending,), daemon=True)
+        self._apply_thread.start()
+        self.root.after(50, self._drain_apply_queue, len(pending), len(self.analysis_results))
 
-            # Backup
-            ExifUtils.backup_file(target_path)
+    def _apply_worker(self, pending):
+        """
+        Worker thread: write every pending result, posting counts to self._apply_queue
 
-            # Write EXIF datetime
-            if isinstance(result['estimated_exif']['datetime'], datetime):
-                target_datetime = result['estimated_exif']['datetime']
+        The final 'done' message carries (photo, exif_date, gps_coords) re-read
+        from each written file, so the Tk thread can update just those photos.
+        """
+        updates = []
+        try:
+            written = []
+            # Each file is backed up and patched independently, so overlap the I/O
+            with ThreadPoolExecutor(max_workers=max(1, min(8, len(pending)))) as executor:
+                futures = {executor.submit(self._write_result_exif, result): result for result in pending}
+                for i, future in enumerate(as_completed(futures)):
+                    if self._cancel_flag.is_set():
+                        # Files already being written finish; the rest are skipped
+                        for other in futures:
+                            other.cancel()
+                    if not future.cancelled():
+                        target = futures[future]['target']
+                        try:
+                            if future.result():
+                                written.append(target)
+                        except Exception as e:
+                            # Counted as not written; the rest of the batch carries on
+                            print(f"    ❌ EXIF write failed for {target['filename']}: {e}")
+                    self._apply_queue.put(('progress', i + 1))
+
+            updates = [(photo,
+                        ExifUtils.get_exif_datetime(photo['path']),
+                        ExifUtils.get_gps_coords(photo['path']))
+                       for photo in written]
+        finally:
+            # Always well-formed, so the Tk thread can restore the UI
+            self._apply_queue.put(('done', updates))
+
+    def _drain_apply_queue(self, count, total):
+        """Show write progress on the Tk thread, at most once per 50 ms poll"""
+        progress = done = None
+        while True:
+            try:
+                message = self._apply_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == 'done':
+                done = message
             else:
-                # String format
-                target_datetime = result['estimated_exif']['datetime']
+                progress = message
 
-            if ExifUtils.write_exif_datetime(target_path, target_datetime):
-                # Write GPS if available
-                gps_coords = result['estimated_exif'].get('gps_coords')
-                if gps_coords:
-                    ExifUtils.write_gps_coords(target_path, gps_coords)
-                success += 1
+        if progress is not None:
+            self.progress_bar['value'] = progress[1] / count * 100
+            self.progress_label.config(text=f"Writing: {progress[1]}/{count}")
+        if done is None:
+            self.root.after(50, self._drain_apply_queue, count, total)
+            return
+
+        self._apply_thread = None
 
         # Hide progress
         self.progress_bar.pack_forget()
         self.progress_label.pack_forget()
         self.progress_frame.pack_forget()
+        self.cancel_btn.config(state=tk.DISABLED)
+        self._update_analyze_button()
+
+        written = done[1]
+        status = "Cancelled" if self._cancel_flag.is_set() else "Complete"
+        messagebox.showinfo(status,
+            f"Successfully wrote EXIF to {len(written)}/{total} photos!\nOriginal files backed up to .backup")
+
+        # Only the written photos changed: update them in place instead of
+        # rescanning both folders
+        for photo, exif_date, gps_coords in written:
+            photo['exif_date'] = exif_date
+            photo['gps_coords'] = gps_coords
+        self.analysis_results.clear()
+        self._clear_target_selection()
 
-        messagebox.showinfo("Complete",
-            f"Successfully wrote EXIF to {success}/{total} photos!\nOriginal files backed up to .backup")
+    @staticmethod
+    def _write_result_exif(result):
+        """Back up one analyzed photo and write its estimated date (and GPS); runs on a worker thread"""
+        target_path = result['target']['path']
+        estimated_exif = result['estimated_exif']
 
-        # Reload
-        self.analysis_results.clear()
-        self._load_photos()
+        ExifUtils.backup_file(target_path)
+
+        if not ExifUtils.write_exif_datetime(target_path, estimated_exif['datetime']):
+            return False
+
+        # Write GPS if available
+        gps_coords = estimated_exif.get('gps_coords')
+        if gps_coords:
+            ExifUtils.write_gps_coords(target_path, gps_coords)
+        return True
 
 
 # =============================================================================
@@ -1872,35 +3119,30 @@ def run_cli_workflow(args):
         if detector.duplicate_groups:
             detector.print_duplicate_groups()
 
+            merge_manager = DuplicateMergeManager(root_folder=folder, backup_base=backup_base)
+            recommendations = [detector.get_merge_recommendation(g) for g in detector.duplicate_groups]
+
             if not args.auto_merge:
                 print("\n❓ Process duplicates? (y/n): ", end='')
                 response = input().strip().lower()
                 if response != 'y':
                     print("⏭️  Skipping duplicate merge")
                     detector.duplicate_groups = []
+                    actions = []
                 else:
-                    # Process each group
-                    merge_manager = DuplicateMergeManager(root_folder=folder, backup_base=backup_base)
-
-                    for group in detector.duplicate_groups:
-                        action = merge_manager.present_merge_options(group)
-                        result = merge_manager.execute_merge(group, action)
-
-                        print(f"\n✅ Group processed: {action}")
-                        print(f"   Kept: {len(result['kept'])} photos")
-                        print(f"   Backed up: {len(result['backed_up'])} photos")
-
-                    merge_manager.print_summary()
+                    actions = merge_manager.review_merge_plan(detector.duplicate_groups, recommendations)
             else:
-                # Auto-merge with smart merge
+                # Auto-merge with smart recommendations
                 print("\n🤖 Auto-merging duplicates...")
-                merge_manager = DuplicateMergeManager(root_folder=folder, backup_base=backup_base)
+                actions = recommendations
 
-                for group in detector.duplicate_groups:
-                    action = detector.get_merge_recommendation(group)
+            if actions:
+                # Collect per-group status and write it once for the phase
+                lines = []
+                for group, action in zip(detector.duplicate_groups, actions):
                     result = merge_manager.execute_merge(group, action)
-
-                    print(f"✅ Auto-merged: {action} - {len(result['kept'])} kept, {len(result['backed_up'])} backed up")
+                    lines.append(f"✅ Group processed: {action} - {len(result['kept'])} kept, {len(result['backed_up'])} backed up")
+                sys.stdout.write("\n".join(lines) + "\n")
 
                 merge_manager.print_summary()
         else:
@@ -1929,6 +3171,14 @@ def run_cli_workflow(args):
     print("=" * 80)
 
 
+def _import_gui_modules():
+    """Import tkinter (and PIL's Tk bridge) only when the GUI is launched"""
+    global tk, ttk, filedialog, messagebox, ImageTk
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox
+    from PIL import ImageTk
+
+
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(
@@ -1959,6 +3209,9 @@ Examples:
 
   # CLI mode - Minimal (skip cleaning and duplicates, no backup)
   python smart_exif_restorer.py --cli --folder "C:/Photos" --skip-cleanup --skip-duplicates --no-backup
+
+  # GUI - Limit visual feature extraction to 4 worker processes
+  python smart_exif_restorer.py --workers 4
         """
     )
 
@@ -1970,9 +3223,13 @@ Examples:
     parser.add_argument('--skip-duplicates', action='store_true', help='Skip duplicate detection phase')
     parser.add_argument('--auto-merge', action='store_true', help='Automatically merge duplicates using smart recommendations')
     parser.add_argument('--auto-yes', action='store_true', help='Auto-confirm all prompts (use with caution)')
+    parser.add_argument('--workers', type=int, metavar='N', help='Worker processes for visual feature extraction (default: CPU count)')
 
     args = parser.parse_args()
 
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+
     if args.cli:
         # CLI Mode
         if not args.folder:
@@ -1993,8 +3250,9 @@ Examples:
 
     else:
         # GUI Mode
+        _import_gui_modules()
         root = tk.Tk()
-        app = SmartExifRestorerGUI(root)
+        app = SmartExifRestorerGUI(root, workers=args.workers)
         root.mainloop()
 
 